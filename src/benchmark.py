@@ -0,0 +1,338 @@
+import os
+import sys
+import csv
+import time
+import signal
+import random
+import threading
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from src.components.database_operation import DatabaseOperation, connection_manager
+from src.components.data_transformation import Preprocessor
+from src.components.feature_encoder import FeatureEncoder
+from src.components.data_imputation import ImputationEngine
+from src.components.model_tuner import ModelTuner
+from src.components.tuning_queue import TuningQueue, TuningQueueConfig, QueueSearchCV
+from sklearn.model_selection import train_test_split, GridSearchCV
+from xgboost import XGBClassifier
+from src.logger import logging
+from src.exception import CustomException
+
+SCHEMA_TRAIN = {
+    "empid": "INTEGER",
+    "satisfaction_level": "FLOAT",
+    "last_evaluation": "FLOAT",
+    "number_project": "INTEGER",
+    "average_montly_hours": "INTEGER",
+    "time_spend_company": "INTEGER",
+    "Work_accident": "INTEGER",
+    "promotion_last_5years": "INTEGER",
+    "salary": "VARCHAR",
+    "left": "INTEGER"
+}
+
+
+class Benchmark:
+    """
+    *****************************************************************************
+    *
+    * filename:       benchmark.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to benchmark the pipeline on synthetic employee data
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,rows=15000,seed=42):
+        self.rows = rows
+        self.seed = seed
+
+    def write_training_file(self,file_path,rows):
+        """
+        * method: write_training_file
+        * description: method to write a synthetic training csv file
+        * return: none
+        *
+        *
+        * Parameters
+        *   file_path:
+        *   rows:
+        """
+        rnd = random.Random(self.seed)
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(SCHEMA_TRAIN.keys())
+            for i in range(rows):
+                row = [i, round(rnd.random(), 2), round(rnd.random(), 2), rnd.randint(2, 7),
+                       rnd.randint(96, 310), rnd.randint(2, 10), rnd.randint(0, 1), rnd.randint(0, 1),
+                       rnd.choice(['low', 'medium', 'high'])]
+                # unsatisfied, overworked employees on low salaries leave more often, so that tuning has signal
+                risk = (1 - row[1]) * 0.5 + (row[4] - 96) / 214 * 0.3 + (row[8] == 'low') * 0.2
+                writer.writerow(row + [int(rnd.random() < risk ** 2)])
+
+    def insert_rows_per_second(self):
+        """
+        * method: insert_rows_per_second
+        * description: method to compare the rows per second of insert_data and insert_data_bulk
+        * return: dictionary of rows per second per insert method
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        try:
+            logging.info('Start of insert benchmark...')
+            results = {}
+            for method in ['insert_data', 'insert_data_bulk']:
+                work_dir = tempfile.mkdtemp()
+                try:
+                    data_path = os.path.join(work_dir, 'training_data')
+                    os.makedirs(data_path)
+                    os.makedirs(data_path + '_rejects')
+                    self.write_training_file(os.path.join(data_path, 'employee.csv'), self.rows)
+                    db = DatabaseOperation('benchmark', data_path, 'training')
+                    db.ingestion_config.database_path = work_dir
+                    db.create_table('training', 'training_raw_data_t', SCHEMA_TRAIN)
+                    start = time.perf_counter()
+                    getattr(db, method)('training', 'training_raw_data_t')
+                    results[method] = self.rows / (time.perf_counter() - start)
+                finally:
+                    connection_manager.close_all()
+                    shutil.rmtree(work_dir)
+                logging.info('%s: %.0f rows/s' % (method, results[method]))
+            logging.info('End of insert benchmark...')
+            return results
+        except Exception as e:
+            logging.info('Exception raised while running insert benchmark')
+            raise CustomException(e,sys)
+
+    def training_set(self,work_dir):
+        """
+        * method: training_set
+        * description: method to build encoded synthetic train and test sets
+        * return: train_x, test_x, train_y, test_y
+        *
+        *
+        * Parameters
+        *   work_dir:
+        """
+        self.write_training_file(os.path.join(work_dir, 'employee.csv'), self.rows)
+        data = pd.read_csv(os.path.join(work_dir, 'employee.csv')).drop(columns=['empid'])
+        features, label = data.drop(columns=['left']), data['left']
+        features = FeatureEncoder().fit(features).transform_frame(features)
+        return train_test_split(features, label, test_size=0.25, random_state=self.seed)
+
+    def tuning_speedup(self,core_counts=None):
+        """
+        * method: tuning_speedup
+        * description: method to measure the wall-clock time of get_best_model per number of cores, with one
+        *              inner thread per fit and both model families tuned at the same time from two cores
+        * return: dictionary of seconds and speedup over one core per number of cores
+        *
+        *
+        * Parameters
+        *   core_counts: defaults to the powers of two up to the number of cores
+        """
+        try:
+            logging.info('Start of tuning speedup benchmark...')
+            cores = os.cpu_count() or 1
+            core_counts = core_counts or [2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores]
+            work_dir = tempfile.mkdtemp()
+            try:
+                train_x, test_x, train_y, test_y = self.training_set(work_dir)
+            finally:
+                shutil.rmtree(work_dir)
+            results = {}
+            for n_jobs in core_counts:
+                tuner = ModelTuner('benchmark', work_dir, 'training')
+                tuner.tuner_config.n_jobs = n_jobs
+                tuner.tuner_config.inner_threads = 1
+                tuner.tuner_config.parallel_families = n_jobs > 1
+                tuner.tuner_config.checkpoint_path = ''
+                start = time.perf_counter()
+                tuner.get_best_model(train_x, train_y, test_x, test_y)
+                results['cores=%d seconds' % n_jobs] = round(time.perf_counter() - start, 2)
+                results['cores=%d speedup' % n_jobs] = round(results['cores=%d seconds' % core_counts[0]] /
+                                                             results['cores=%d seconds' % n_jobs], 2)
+                logging.info('%d cores: %.2f s' % (n_jobs, results['cores=%d seconds' % n_jobs]))
+            logging.info('End of tuning speedup benchmark...')
+            return results
+        except Exception as e:
+            logging.info('Exception raised while running tuning speedup benchmark')
+            raise CustomException(e,sys)
+
+    def search_time_to_quality(self,strategies=None):
+        """
+        * method: search_time_to_quality
+        * description: method to compare the search strategies of ModelTuner on the wall-clock time, the number
+        *              of fits and the test AUC of the chosen model
+        * return: dictionary of seconds, fits and AUC per strategy
+        *
+        *
+        * Parameters
+        *   strategies: list of (name, tuner config settings), defaults to grid, staged, binned, early
+        *               stopping, random and both halvings
+        """
+        try:
+            logging.info('Start of search strategy benchmark...')
+            strategies = strategies or [
+                ('grid', {'search_strategy': 'grid'}),
+                ('staged', {'search_strategy': 'staged'}),
+                ('binned', {'search_strategy': 'binned'}),
+                ('early stopping', {'search_strategy': 'grid', 'early_stopping_rounds': 10}),
+                ('random', {'search_strategy': 'random', 'n_iter': 10}),
+                ('halving n_samples', {'search_strategy': 'halving', 'halving_resource': 'n_samples'}),
+                ('halving n_estimators', {'search_strategy': 'halving', 'halving_resource': 'n_estimators'})
+            ]
+            work_dir = tempfile.mkdtemp()
+            try:
+                train_x, test_x, train_y, test_y = self.training_set(work_dir)
+            finally:
+                shutil.rmtree(work_dir)
+            results = {}
+            for name, settings in strategies:
+                tuner = ModelTuner('benchmark', work_dir, 'training')
+                # every strategy fits all its candidates, without the scores stored by earlier runs
+                tuner.tuner_config.checkpoint_path = ''
+                for key, value in settings.items():
+                    setattr(tuner.tuner_config, key, value)
+                start = time.perf_counter()
+                tuner.get_best_model(train_x, train_y, test_x, test_y)
+                results[name + ' seconds'] = round(time.perf_counter() - start, 2)
+                results[name + ' fits'] = tuner.fits
+                results[name + ' auc'] = round(max(tuner.xgboost_score, tuner.random_forest_score), 4)
+                logging.info('%s: %.2f s, %d fits, AUC %.4f' % (name, results[name + ' seconds'], tuner.fits,
+                                                               results[name + ' auc']))
+            logging.info('End of search strategy benchmark...')
+            return results
+        except Exception as e:
+            logging.info('Exception raised while running search strategy benchmark')
+            raise CustomException(e,sys)
+
+    def predict_latency(self,iterations=2000):
+        """
+        * method: predict_latency
+        * description: method to compare the p50 and p99 latency of scoring one record with preprocess_predict
+        *              and with preprocess_records, every tenth record has a missing value to impute
+        * return: dictionary of latency in milliseconds per path and percentile
+        *
+        *
+        * Parameters
+        *   iterations:
+        """
+        try:
+            logging.info('Start of predict latency benchmark...')
+            work_dir = tempfile.mkdtemp()
+            try:
+                data_path = os.path.join(work_dir, 'prediction_data')
+                os.makedirs(data_path + '_validation')
+                self.write_training_file(os.path.join(work_dir, 'employee.csv'), self.rows)
+                features = pd.read_csv(os.path.join(work_dir, 'employee.csv')).drop(columns=['empid', 'left'])
+                preprocessor = Preprocessor('benchmark', data_path, 'prediction')
+                preprocessor.encoder = FeatureEncoder().fit(features)
+                preprocessor.imputer = ImputationEngine().fit(preprocessor.encoder.transform(features))
+                records = features.sample(iterations, replace=True, random_state=self.seed).to_dict('records')
+                for record in records[::10]:
+                    record['satisfaction_level'] = None
+                paths = {
+                    'preprocess_predict': lambda record: preprocessor.preprocess_predict(pd.DataFrame([record])),
+                    'preprocess_records': preprocessor.preprocess_records
+                }
+                results = {}
+                for name, path in paths.items():
+                    path(records[0])
+                    latencies = []
+                    for record in records:
+                        start = time.perf_counter()
+                        path(record)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    for percentile in [50, 99]:
+                        results['%s p%d (ms)' % (name, percentile)] = round(float(np.percentile(latencies, percentile)), 4)
+                        logging.info('%s p%d: %.4f ms' % (name, percentile, results['%s p%d (ms)' % (name, percentile)]))
+            finally:
+                shutil.rmtree(work_dir)
+            logging.info('End of predict latency benchmark...')
+            return results
+        except Exception as e:
+            logging.info('Exception raised while running predict latency benchmark')
+            raise CustomException(e,sys)
+
+    def queue_recovery(self,lease_seconds=2):
+        """
+        * method: queue_recovery
+        * description: method to check that a queued search survives the death of its worker: the only local
+        *              worker is killed in the middle of a fit, the coordinator restarts it, the job of the
+        *              killed worker is taken back when its lease expires and the scores equal GridSearchCV
+        * return: dictionary of seconds, attempts of the killed job and equality of the scores
+        *
+        *
+        * Parameters
+        *   lease_seconds:
+        """
+        try:
+            logging.info('Start of queue recovery benchmark...')
+            work_dir = tempfile.mkdtemp()
+            try:
+                train_x, test_x, train_y, test_y = self.training_set(work_dir)
+                config = TuningQueueConfig(queue_path=os.path.join(work_dir, 'queue', 'tuning_queue.db'),
+                                           lease_seconds=lease_seconds, poll_seconds=0.2, worker_timeout=60,
+                                           keep_finished=True)
+                queue = TuningQueue(config)
+                estimator = XGBClassifier(objective='binary:logistic', n_jobs=1)
+                param_grid = {'max_depth': [3, 5], 'n_estimators': [50, 100]}
+                killed = []
+
+                def kill_worker():
+                    # the worker id ends with the process id and a random suffix
+                    while not killed:
+                        for job in queue.running_jobs():
+                            os.kill(int(job['worker'].split('-')[-2]), signal.SIGKILL)
+                            killed.append(job['job_id'])
+                            logging.info('Killed the worker of tuning job %d' % job['job_id'])
+                            break
+                        time.sleep(0.05)
+
+                killer = threading.Thread(target=kill_worker, daemon=True)
+                killer.start()
+                start = time.perf_counter()
+                search = QueueSearchCV(estimator, param_grid, cv=5, n_workers=1, config=config).fit(train_x, train_y)
+                seconds = time.perf_counter() - start
+                killer.join()
+                conn = queue.connect()
+                try:
+                    attempts = conn.execute('SELECT attempts FROM tuning_jobs_t WHERE job_id = ?', killed).fetchone()[0]
+                finally:
+                    conn.close()
+                reference = GridSearchCV(estimator, param_grid, cv=5).fit(train_x, train_y)
+                results = {'seconds': round(seconds, 2), 'killed job attempts': attempts,
+                           'same scores as grid search': bool(np.allclose(search.cv_results_['mean_test_score'],
+                                                                          reference.cv_results_['mean_test_score']))}
+            finally:
+                shutil.rmtree(work_dir)
+            logging.info('End of queue recovery benchmark...')
+            return results
+        except Exception as e:
+            logging.info('Exception raised while running queue recovery benchmark')
+            raise CustomException(e,sys)
+
+
+if __name__=="__main__":
+    benchmarks = {
+        'insert': 'insert_rows_per_second',
+        'predict': 'predict_latency',
+        'tuning': 'tuning_speedup',
+        'search': 'search_time_to_quality',
+        'queue': 'queue_recovery',
+    }
+    name = sys.argv[1] if len(sys.argv) > 1 else 'insert'
+    for key, value in getattr(Benchmark(), benchmarks[name])().items():
+        print('%-30s %s' % (key, value))
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import shutil
+import tarfile
+from datetime import datetime
+from src.logger import logging
+from src.exception import CustomException
+
+# directory suffix of the data path and archive name prefix of each archived file set
+ARCHIVE_SOURCES = [
+    ('_rejects', 'reject'),
+    ('_validation', 'validation'),
+    ('_processed', 'processed'),
+    ('_results', 'results')
+]
+
+
+class ArchiveOperation:
+    """
+    *****************************************************************************
+    *
+    * filename:       archive_operation.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to archive the rejected, validated, processed and result files of a run,
+    *                 either moved into a directory or packed into one compressed tar per file set.
+    *                 Every archive is recorded in archive_index.jsonl to list and restore past runs, with
+    *                 the id of the run that archived the files as archived_by_run
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,run_id,data_path,mode):
+        self.run_id = run_id
+        self.data_path = data_path
+        self.archive_path = self.data_path + '_archive'
+        self.index_file = os.path.join(self.archive_path, 'archive_index.jsonl')
+
+    def move_files(self,source,dest):
+        """
+        * method: move_files
+        * description: method to move the files of source into dest, listing both directories only once.
+        *              Files already present in dest are left in source
+        * return: list of moved file names
+        *
+        *
+        * Parameters
+        *   source:
+        *   dest:
+        """
+        os.makedirs(dest, exist_ok=True)
+        existing = set(os.listdir(dest))
+        moved = []
+        for f in os.listdir(source):
+            if f not in existing:
+                shutil.move(os.path.join(source, f), dest)
+                moved.append(f)
+        return moved
+
+    def pack_files(self,source,archive_file):
+        """
+        * method: pack_files
+        * description: method to pack the files of source into a gzip compressed tar and remove them
+        * return: list of index entries of the packed files
+        *
+        *
+        * Parameters
+        *   source:
+        *   archive_file:
+        """
+        files = []
+        with tarfile.open(archive_file + '.part', 'w:gz') as tar:
+            for f in sorted(os.listdir(source)):
+                path = os.path.join(source, f)
+                tar.add(path, arcname=f)
+                size = os.path.getsize(path) if os.path.isfile(path) else \
+                    sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+                files.append({'name': f, 'size': size})
+        os.replace(archive_file + '.part', archive_file)
+        for f in files:
+            path = os.path.join(source, f['name'])
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        return files
+
+    def record_archive(self,entry):
+        """
+        * method: record_archive
+        * description: method to append an archive entry to the archive index
+        * return: none
+        *
+        *
+        * Parameters
+        *   entry:
+        """
+        with open(self.index_file, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def archive(self,include_validation=True,pack=False):
+        """
+        * method: archive
+        * description: method to archive the rejected, validated, processed and result files
+        * return: none
+        *
+        *
+        * Parameters
+        *   include_validation: False to keep the validated files
+        *   pack: True to pack each file set into one compressed tar instead of a directory
+        """
+        now = datetime.now()
+        date = now.date()
+        time = now.strftime("%H%M%S")
+        try:
+            for suffix, prefix in ARCHIVE_SOURCES:
+                source = self.data_path + suffix
+                if suffix == '_validation' and not include_validation:
+                    continue
+                logging.info('Start of Archiving Old %s Files...' % prefix)
+                if os.path.isdir(source) and os.listdir(source):
+                    os.makedirs(self.archive_path, exist_ok=True)
+                    name = prefix + '_' + str(date) + "_" + str(time)
+                    if pack:
+                        files = self.pack_files(source, os.path.join(self.archive_path, name + '.tar.gz'))
+                        self.record_archive({'name': name, 'kind': prefix, 'packed': True, 'archived_by_run': self.run_id,
+                                             'archive': name + '.tar.gz', 'files': files})
+                    else:
+                        files = self.move_files(source, os.path.join(self.archive_path, name))
+                        self.record_archive({'name': name, 'kind': prefix, 'packed': False, 'archived_by_run': self.run_id,
+                                             'archive': name, 'files': [{'name': f} for f in files]})
+                logging.info('End of Archiving Old %s Files...' % prefix)
+        except Exception as e:
+            logging.info('Exception raised while Archiving Old Files')
+            raise CustomException(e,sys)
+
+    def list_archives(self):
+        """
+        * method: list_archives
+        * description: method to list the archives recorded in the archive index, without opening them
+        * return: list of archive entries
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        try:
+            if not os.path.isfile(self.index_file):
+                return []
+            with open(self.index_file, 'r') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except Exception as e:
+            logging.info('Exception raised while Listing Archives')
+            raise CustomException(e,sys)
+
+    def restore(self,name,dest=None):
+        """
+        * method: restore
+        * description: method to restore an archived file set, by default into the directory it was taken from
+        * return: list of restored file names
+        *
+        *
+        * Parameters
+        *   name: archive name as listed by list_archives
+        *   dest:
+        """
+        try:
+            logging.info('Start of Restoring Archive %s...' % name)
+            entry = next(entry for entry in reversed(self.list_archives()) if entry['name'] == name)
+            suffix = next(suffix for suffix, prefix in ARCHIVE_SOURCES if prefix == entry['kind'])
+            dest = dest or self.data_path + suffix
+            os.makedirs(dest, exist_ok=True)
+            archive = os.path.join(self.archive_path, entry['archive'])
+            if entry['packed']:
+                with tarfile.open(archive, 'r:gz') as tar:
+                    if hasattr(tarfile, 'data_filter'):
+                        tar.extractall(dest, filter='data')
+                    else:
+                        # no extraction filter in this Python, reject the members that would leave dest
+                        for member in tar.getmembers():
+                            if (os.path.isabs(member.name) or '..' in member.name.replace('\\', '/').split('/')
+                                    or not (member.isfile() or member.isdir())):
+                                raise ValueError('Unsafe archive member: ' + member.name)
+                        tar.extractall(dest)
+                restored = [f['name'] for f in entry['files']]
+            else:
+                restored = []
+                for f in os.listdir(archive):
+                    path = os.path.join(archive, f)
+                    if os.path.isdir(path):
+                        shutil.copytree(path, os.path.join(dest, f))
+                    else:
+                        shutil.copy2(path, dest)
+                    restored.append(f)
+            logging.info('End of Restoring Archive %s...' % name)
+            return restored
+        except Exception as e:
+            logging.info('Exception raised while Restoring Archive')
+            raise CustomException(e,sys)
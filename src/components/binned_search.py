@@ -0,0 +1,126 @@
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+import xgboost as xgb
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, check_cv
+from src.logger import logging
+from src.exception import CustomException
+
+def _fit_fold(data_dir,train,test,max_bin,configurations,stages):
+    """
+    * method: _fit_fold
+    * description: function to bin the training rows of a fold once, from the memory-mapped training set, and
+    *              score every configuration on that matrix. The largest XGBoost ensemble of a configuration
+    *              is trained and the smaller ensembles are scored as its prefixes. The matrices of the fold
+    *              are released when the function returns
+    * return: list of the accuracies per stage of each configuration
+    *
+    *
+    * Parameters
+    *   data_dir: directory of the shared x.npy and y.npy
+    *   train: row indices of the fold training rows
+    *   test: row indices of the fold test rows
+    *   max_bin:
+    *   configurations: list of booster parameters
+    *   stages: sorted numbers of trees
+    """
+    x = np.load(os.path.join(data_dir, 'x.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    train_matrix = xgb.QuantileDMatrix(x[train], y[train], max_bin=max_bin)
+    test_matrix, test_y = xgb.DMatrix(x[test]), np.asarray(y[test])
+    scores = []
+    for params in configurations:
+        booster = xgb.train(params, train_matrix, num_boost_round=stages[-1])
+        scores.append([accuracy_score(test_y, booster.predict(test_matrix, iteration_range=(0, stage)) > 0.5)
+                       for stage in stages])
+    return scores
+
+
+class BinnedSearchCV:
+    """
+    *****************************************************************************
+    *
+    * filename:       binned_search.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for an exhaustive grid search of XGBoost with the hist tree method on training
+    *                 data binned once per fold. The training set is written once to memory-mappable files
+    *                 shared by the worker processes; an XGBoost matrix cannot be shared between processes,
+    *                 so each fold is given to a single worker, which bins it, scores every candidate on it
+    *                 and releases it before taking the next fold. The number of trees is scored as prefixes
+    *                 of the largest
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,estimator,param_grid,cv=5,n_jobs=1,max_bin=256):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.max_bin = max_bin
+
+    def fit(self,train_x,train_y):
+        """
+        * method: fit
+        * description: method to score every candidate of the grid and refit the best one on all the data
+        * return: the fitted search
+        *
+        *
+        * Parameters
+        *   train_x:
+        *   train_y:
+        """
+        data_dir = tempfile.mkdtemp(prefix='binned_search_')
+        try:
+            stages = sorted(self.param_grid['n_estimators'])
+            grid = {key: value for key, value in self.param_grid.items() if key != 'n_estimators'}
+            configurations = list(ParameterGrid(grid))
+            folds = list(check_cv(self.cv, train_y, classifier=True).split(train_x, train_y))
+            self.n_splits_ = len(folds)
+            self.n_fits_ = len(configurations) * len(folds)
+            logging.info('Binned search of %d configurations x %d stages' % (len(configurations), len(stages)))
+            np.save(os.path.join(data_dir, 'x.npy'), np.asarray(train_x, dtype='float32'))
+            np.save(os.path.join(data_dir, 'y.npy'), np.asarray(train_y, dtype='float32'))
+            booster_params = []
+            for params in configurations:
+                booster = clone(self.estimator).set_params(tree_method='hist', max_bin=self.max_bin, **params).get_xgb_params()
+                booster_params.append({key: value for key, value in booster.items() if value is not None})
+            # one task per fold, so that each fold is binned once and held by one worker at a time
+            tasks = [(data_dir, train, test, self.max_bin, booster_params, stages) for train, test in folds]
+            if self.n_jobs == 1:
+                scores = [_fit_fold(*task) for task in tasks]
+            else:
+                # spawned rather than forked, the search may run in a thread of the training pipeline
+                with ProcessPoolExecutor(max_workers=max(1, min(self.n_jobs, len(tasks))),
+                                         mp_context=multiprocessing.get_context('spawn')) as executor:
+                    scores = list(executor.map(_fit_fold, *zip(*tasks)))
+            scores = np.array(scores).reshape(len(folds), len(configurations), len(stages)).mean(axis=0)
+            self.cv_results_ = {'params': [], 'mean_test_score': []}
+            for params, configuration_scores in zip(configurations, scores):
+                for stage, score in zip(stages, configuration_scores):
+                    self.cv_results_['params'].append(dict(params, n_estimators=stage))
+                    self.cv_results_['mean_test_score'].append(score)
+            self.best_index_ = int(np.argmax(self.cv_results_['mean_test_score']))
+            self.best_params_ = self.cv_results_['params'][self.best_index_]
+            self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+            self.best_estimator_ = clone(self.estimator).set_params(tree_method='hist', max_bin=self.max_bin,
+                                                                    **self.best_params_).fit(train_x, train_y)
+            return self
+        except Exception as e:
+            logging.info('Exception raised while running binned search')
+            raise CustomException(e,sys)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
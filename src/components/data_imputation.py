@@ -0,0 +1,143 @@
+import sys
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+from src.logger import logging
+from src.exception import CustomException
+
+
+class ImputationEngine:
+    """
+    *****************************************************************************
+    *
+    * filename:       data_imputation.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to impute missing values from the training population. It is fitted once on
+    *                 the training data and saved with the model. The knn strategy averages the n nearest
+    *                 complete training rows, searched in a KD-tree built on the observed columns of each
+    *                 missing-value pattern. The statistical strategy fills the training medians. The
+    *                 donors and the imputed batches are kept in the given float dtype
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,strategy='knn',n_neighbors=3,chunk_size=10000,max_donors=0,random_state=42,dtype='float64'):
+        self.strategy = strategy
+        self.n_neighbors = n_neighbors
+        self.chunk_size = chunk_size
+        self.max_donors = max_donors
+        self.random_state = random_state
+        self.dtype = dtype
+        self.trees = {}
+
+    def __getstate__(self):
+        # the trees are rebuilt on first use instead of being saved with the model
+        state = self.__dict__.copy()
+        state['trees'] = {}
+        return state
+
+    def fit(self,data):
+        """
+        * method: fit
+        * description: method to learn the medians and the complete rows used as neighbors
+        * return: the fitted imputation engine
+        *
+        *
+        * Parameters
+        *   data:
+        """
+        try:
+            logging.info('Start of fitting imputation engine...')
+            values = np.asarray(data, dtype=self.dtype)
+            self.medians = np.nanmedian(values, axis=0)
+            self.medians[np.isnan(self.medians)] = 0
+            self.donors = values[~np.isnan(values).any(axis=1)]
+            if self.max_donors and len(self.donors) > self.max_donors:
+                rows = np.random.RandomState(self.random_state).choice(len(self.donors), self.max_donors, replace=False)
+                self.donors = self.donors[rows]
+            self.trees = {}
+            logging.info('Imputation donors: %d' % len(self.donors))
+            logging.info('End of fitting imputation engine...')
+            return self
+        except Exception as e:
+            logging.info('Exception raised while fitting imputation engine')
+            raise CustomException(e,sys)
+
+    def get_tree(self,observed):
+        """
+        * method: get_tree
+        * description: method to get the KD-tree of the donors on the observed columns, built once per pattern
+        * return: KDTree
+        *
+        *
+        * Parameters
+        *   observed: boolean mask of the observed columns
+        """
+        key = observed.tobytes()
+        if key not in self.trees:
+            self.trees[key] = KDTree(self.donors[:, observed])
+        return self.trees[key]
+
+    def transform_array(self,values):
+        """
+        * method: transform_array
+        * description: method to impute the missing values of a float array in place
+        * return: the imputed array
+        *
+        *
+        * Parameters
+        *   values:
+        """
+        missing = np.isnan(values)
+        rows = np.nonzero(missing.any(axis=1))[0]
+        if len(rows) == 0:
+            return values
+        if self.strategy == 'statistical' or len(self.donors) < self.n_neighbors:
+            values[missing] = np.take(self.medians, np.nonzero(missing)[1])
+            return values
+        patterns, inverse = np.unique(missing[rows], axis=0, return_inverse=True)
+        for i, pattern in enumerate(patterns):
+            pattern_rows = rows[inverse.ravel() == i]
+            observed = ~pattern
+            if not observed.any():
+                values[np.ix_(pattern_rows, pattern)] = self.medians[pattern]
+                continue
+            tree = self.get_tree(observed)
+            for start in range(0, len(pattern_rows), self.chunk_size):
+                chunk = pattern_rows[start:start + self.chunk_size]
+                _, neighbors = tree.query(values[np.ix_(chunk, observed)], k=self.n_neighbors)
+                values[np.ix_(chunk, pattern)] = self.donors[neighbors][:, :, pattern].mean(axis=1)
+        return values
+
+    def transform(self,data):
+        """
+        * method: transform
+        * description: method to impute the missing values of a batch from the training population
+        * return: A pandas DataFrame, or a numpy array when an array is given. The integer columns of a
+        *         DataFrame have no missing values and are returned as given
+        *
+        *
+        * Parameters
+        *   data:
+        """
+        try:
+            logging.info('Start of imputing with %s strategy...' % self.strategy)
+            values = self.transform_array(np.array(data, dtype=getattr(self, 'dtype', 'float64')))
+            logging.info('End of imputing with %s strategy...' % self.strategy)
+            if isinstance(data, pd.DataFrame):
+                frame = pd.DataFrame(values, columns=data.columns, index=data.index)
+                for column in data.columns:
+                    if pd.api.types.is_integer_dtype(data[column].dtype):
+                        frame[column] = data[column]
+                return frame
+            return values
+        except Exception as e:
+            logging.info('Exception raised while imputing missing values')
+            raise CustomException(e,sys)
@@ -1,13 +1,17 @@
-import json
+import csv
 from os import listdir
 import sys
 import shutil
 import pandas as pd
-from datetime import datetime
 import os
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.model_selection import train_test_split
 from src.components.database_operation import DatabaseOperation
+from src.components.archive_operation import ArchiveOperation
+from src.components.data_schema import load_schema
+from src.components.data_transformation import DataTransformationConfig
+from src.utils import get_file_hash
 from src.logger import logging
 from src.exception import CustomException
 
@@ -16,6 +20,50 @@ class DataIngestionConfig:
     train_data_path: str=os.path.join('artifacts',"train.csv") 
     test_data_path: str=os.path.join('artifacts',"test.csv") 
     raw_data_path: str=os.path.join('artifacts',"data.csv") 
+    chunk_size: int=100000
+    workers: int=1
+    incremental: bool=True
+    export_format: str='csv'
+    pack_archives: bool=False
+
+
+def _scan_file(file_path,number_of_columns,chunk_size,schema=None):
+    """
+    * method: _scan_file
+    * description: validates the column length, the all-missing columns and, when a schema is given, the
+    *              column types of a csv file and rewrites the missing values as empty fields, loaded as
+    *              SQL NULLs, reading the file once in chunks of chunk_size rows
+    * return: None if the file is valid, otherwise the reason for rejecting it
+    *
+    *
+    * Parameters
+    *   file_path:
+    *   number_of_columns:
+    *   chunk_size:
+    *   schema:
+    """
+    if pd.read_csv(file_path, nrows=0).shape[1] != number_of_columns:
+        return 'Invalid Columns Length'
+    part_path = file_path + '.part'
+    out = open(part_path, 'w', newline='')
+    try:
+        non_null = None
+        # values are kept as text so that the rewritten file matches the source apart from the missing values
+        for chunk in pd.read_csv(file_path, dtype=str, chunksize=chunk_size):
+            reason = schema.validate(chunk) if schema is not None else None
+            if reason is not None:
+                return reason
+            non_null = chunk.count() if non_null is None else non_null + chunk.count()
+            chunk.to_csv(out, index=None, header=out.tell() == 0)
+        if non_null is None or (non_null == 0).any():
+            return 'All Missing Values in Column'
+        out.close()
+        os.replace(part_path, file_path)
+        return None
+    finally:
+        out.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
 
 class LoadValidate:
     """
@@ -38,11 +86,16 @@ class LoadValidate:
         self.run_id = run_id
         self.data_path = data_path
         self.dbOperation = DatabaseOperation(self.run_id, self.data_path, mode)
+        self.archiveOperation = ArchiveOperation(self.run_id, self.data_path, mode)
+        self.ingestion_config=DataIngestionConfig()
+        # the columnar export follows the compact_dtypes setting of the preprocessing, ModelTrainer shares
+        # the Preprocessor configuration so that both stages use the same float dtype
+        self.transformation_config=DataTransformationConfig()
 
     def values_from_schema(self,schema_file):
         """
         * method: values_from_schema
-        * description: method to read schema file
+        * description: method to read schema file, compiled once and cached until the file changes
         * return: column_names, Number of Columns
         *
         *
@@ -51,95 +104,120 @@ class LoadValidate:
         """
         try:
             logging.info('Start of Reading values From Schema...')
-            with open('artifacts/database/'+schema_file+'.json', 'r') as f:
-                dic = json.load(f)
-                f.close()
-            column_names = dic['ColName']
-            number_of_columns = dic['NumberofColumns']
+            schema = load_schema(schema_file)
+            column_names = schema.column_names
+            number_of_columns = schema.number_of_columns
             logging.info('End of Reading values From Schema...')
         except Exception as e:
             logging.info('Exception raised while Reading values From Schema: %s' % e)
             raise CustomException(e,sys)
         return column_names, number_of_columns
 
-    def validate_column_length(self,number_of_columns):
+    def validate_files(self,number_of_columns,schema=None):
         """
-        * method: validate_column_length
-        * description: method to validates the number of columns in the csv files
+        * method: validate_files
+        * description: method to validate the column length, the missing values and the column types of the
+        *              csv files and normalise the missing values to empty fields in a single chunked pass per file
         * return: none
         *
         *
         * Parameters
-        *   NumberofColumns:
+        *   number_of_columns:
+        *   schema: compiled schema to validate the column types, optional
         """
         try:
-            logging.info('Start of Validating Column Length...')
+            logging.info('Start of Validating Files...')
             for file in listdir(self.data_path):
-                csv = pd.read_csv(self.data_path+'/'+ file)
-                if csv.shape[1] == number_of_columns:
-                    pass
+                reason = _scan_file(self.data_path+'/'+file, number_of_columns, self.ingestion_config.chunk_size,
+                                    schema=schema)
+                if reason is None:
+                    logging.info('%s: File Transformed successfully!!' % file)
                 else:
-                    shutil.move(self.data_path +'/'+ file, self.data_path+'_rejects')
-                    self.logger.info("Invalid Columns Length :: %s" % file)
+                    os.makedirs(self.data_path+'_rejects', exist_ok=True)
+                    shutil.move(self.data_path+'/'+file, self.data_path+'_rejects')
+                    logging.info("%s :: %s" % (reason, file))
 
-            logging.info('End of Validating Column Length...')
+            logging.info('End of Validating Files...')
         except Exception as e:
-            logging.info('Exception raised while Validating Column Length')
+            logging.info('Exception raised while Validating Files')
             raise CustomException(e,sys)
 
-    def validate_missing_values(self):
+    def skip_loaded_files(self,database_name):
         """
-        * method: validate_missing_values
-        * description: method to validates if any column in the csv file has all values missing.
-        *              If all the values are missing, the file is not suitable for processing. it has to be moved to bad file
-        * return: none
+        * method: skip_loaded_files
+        * description: method to move the files whose content is already recorded in the manifest
+        *              to the processed files, so that only new or changed files are loaded
+        * return: dictionary of content hash per file to load
         *
         *
         * Parameters
-        *   none:
+        *   database_name:
         """
         try:
-            logging.info('Start of Validating Missing Values...')
+            logging.info('Start of Skipping Loaded Files...')
+            self.dbOperation.create_manifest(database_name)
+            conn = self.dbOperation.database_connection(database_name)
+            file_hashes = {}
+            seen_hashes = set()
             for file in listdir(self.data_path):
-                csv = pd.read_csv(self.data_path+'/'+ file)
-                count = 0
-                for columns in csv:
-                    if (len(csv[columns]) - csv[columns].count()) == len(csv[columns]):
-                        count+=1
-                        shutil.move(self.data_path+'/' + file,self.data_path+'_rejects')
-                        logging.info("All Missing Values in Column :: %s" % file)
-                        break
+                file_hash = get_file_hash(self.data_path+'/'+file)
+                if file_hash in seen_hashes or self.dbOperation.is_file_loaded(conn, file_hash):
+                    os.makedirs(self.data_path+'_processed', exist_ok=True)
+                    shutil.move(self.data_path+'/'+file, self.data_path+'_processed')
+                    logging.info("Skipped the already loaded file %s" % file)
+                else:
+                    file_hashes[file] = file_hash
+                seen_hashes.add(file_hash)
 
-            logging.info('End of Validating Missing Values...')
+            logging.info('End of Skipping Loaded Files...')
+            return file_hashes
         except Exception as e:
-            logging.info('Exception raised while Validating Missing Values')
+            logging.info('Exception raised while Skipping Loaded Files')
             raise CustomException(e,sys)
 
-
-    def replace_missing_values(self):
+    def ingest_files_parallel(self,number_of_columns,database_name,table_name,file_hashes=None,schema=None):
         """
-        * method: replace_missing_values
-        * description: method to replaces the missing values in columns with "NULL"
+        * method: ingest_files_parallel
+        * description: method to validate and normalise the csv files in a pool of worker processes and insert
+        *              the rewritten files into table from this process only, as the single database writer.
+        *              The workers only return the validation result, the parent streams each file into the
+        *              table in batches so that the memory does not grow with the file size
         * return: none
         *
         *
         * Parameters
-        *   none:
+        *   number_of_columns:
+        *   database_name:
+        *   table_name:
+        *   file_hashes: content hash per file to record in the manifest, optional
+        *   schema: compiled schema to validate the column types, optional
         """
         try:
-            logging.info('Start of Replacing Missing Values with NULL...')
-            only_files = [f for f in listdir(self.data_path)]
-            for file in only_files:
-                csv = pd.read_csv(self.data_path + "/" + file)
-                csv.fillna('NULL', inplace=True)
-                csv.to_csv(self.data_path + "/" + file, index=None, header=True)
-                logging.info('%s: File Transformed successfully!!' % file)
-            logging.info('End of Replacing Missing Values with NULL...')
+            logging.info('Start of Parallel Ingestion of Files...')
+            conn = self.dbOperation.database_connection(database_name)
+            with ProcessPoolExecutor(max_workers=self.ingestion_config.workers) as executor:
+                futures = {executor.submit(_scan_file, self.data_path+'/'+file, number_of_columns,
+                                           self.ingestion_config.chunk_size, schema): file
+                           for file in listdir(self.data_path)}
+                for future in as_completed(futures):
+                    file = futures[future]
+                    reason = future.result()
+                    if reason is None:
+                        with open(self.data_path+'/'+file, 'r', newline='') as f:
+                            next(f)
+                            self.dbOperation.insert_rows(conn, table_name, file, csv.reader(f, delimiter=','),
+                                                         file_hashes.get(file) if file_hashes else None)
+                    else:
+                        os.makedirs(self.data_path+'_rejects', exist_ok=True)
+                        shutil.move(self.data_path+'/'+file, self.data_path+'_rejects')
+                        logging.info("%s :: %s" % (reason, file))
+
+            logging.info('End of Parallel Ingestion of Files...')
         except Exception as e:
-            logging.info('Exception raised while Replacing Missing Values with NULL')
+            logging.info('Exception raised while Parallel Ingestion of Files')
             raise CustomException(e,sys)
 
-    def archive_old_files(self):
+    def archive_old_files(self,include_validation=True):
         """
         * method: archive_old_rejects
         * description: method to archive rejected files
@@ -147,75 +225,10 @@ class LoadValidate:
         *
         *
         * Parameters
-        *   none:
+        *   include_validation: False to keep the validated files for an incremental export
         """
-        now = datetime.now()
-        date = now.date()
-        time = now.strftime("%H%M%S")
         try:
-            logging.info('Start of Archiving Old Rejected Files...')
-            source = self.data_path+'_rejects/'
-            if os.path.isdir(source):
-                path = self.data_path+'_archive'
-                if not os.path.isdir(path):
-                    os.makedirs(path)
-                dest = path+'/reject_' + str(date)+"_"+str(time)
-                files = os.listdir(source)
-                for f in files:
-                    if not os.path.isdir(dest):
-                        os.makedirs(dest)
-                    if f not in os.listdir(dest):
-                        shutil.move(source + f, dest)
-
-            logging.info('End of Archiving Old Rejected Files...')
-
-            logging.info('Start of Archiving Old Validated Files...')
-            source = self.data_path + '_validation/'
-            if os.path.isdir(source):
-                path = self.data_path + '_archive'
-                if not os.path.isdir(path):
-                    os.makedirs(path)
-                dest = path + '/validation_' + str(date) + "_" + str(time)
-                files = os.listdir(source)
-                for f in files:
-                    if not os.path.isdir(dest):
-                        os.makedirs(dest)
-                    if f not in os.listdir(dest):
-                        shutil.move(source + f, dest)
-
-            logging.info('End of Archiving Old Validated Files...')
-
-            logging.info('Start of Archiving Old Processed Files...')
-            source = self.data_path + '_processed/'
-            if os.path.isdir(source):
-                path = self.data_path + '_archive'
-                if not os.path.isdir(path):
-                    os.makedirs(path)
-                dest = path + '/processed_' + str(date) + "_" + str(time)
-                files = os.listdir(source)
-                for f in files:
-                    if not os.path.isdir(dest):
-                        os.makedirs(dest)
-                    if f not in os.listdir(dest):
-                        shutil.move(source + f, dest)
-
-            logging.info('End of Archiving Old Processed Files...')
-
-            logging.info('Start of Archiving Old Result Files...')
-            source = self.data_path + '_results/'
-            if os.path.isdir(source):
-                path = self.data_path + '_archive'
-                if not os.path.isdir(path):
-                    os.makedirs(path)
-                dest = path + '/results_' + str(date) + "_" + str(time)
-                files = os.listdir(source)
-                for f in files:
-                    if not os.path.isdir(dest):
-                        os.makedirs(dest)
-                    if f not in os.listdir(dest):
-                        shutil.move(source + f, dest)
-
-            logging.info('End of Archiving Old Result Files...')
+            self.archiveOperation.archive(include_validation, self.ingestion_config.pack_archives)
         except Exception as e:
             logging.info('Exception raised while Archiving Old Rejected Files')
             raise CustomException(e,sys)
@@ -232,6 +245,7 @@ class LoadValidate:
         """
         try:
             logging.info('Start of Moving Processed Files...')
+            os.makedirs(self.data_path + '_processed', exist_ok=True)
             for file in listdir(self.data_path):
                 shutil.move(self.data_path + '/' + file, self.data_path + '_processed')
                 logging.info("Moved the already processed file %s" % file)
@@ -253,22 +267,33 @@ class LoadValidate:
         """
         try:
             logging.info('Start of Data Load, validation and transformation')
-            # archive old  files
-            self.archive_old_files()
+            incremental = self.ingestion_config.incremental
+            # archive old  files, the validated files are kept to be updated by an incremental export
+            self.archive_old_files(include_validation=not incremental)
             # extracting values from training schema
             column_names, number_of_columns = self.values_from_schema('schema_train')
-            # validating column length in the file
-            self.validate_column_length(number_of_columns)
-            # validating if any column has all values missing
-            self.validate_missing_values()
-            # replacing blanks in the csv file with "Null" values
-            self.replace_missing_values()
-            # create database with given name, if present open the connection! Create table with columns given in schema
-            self.dbOperation.create_table('training','training_raw_data_t',column_names)
-            # insert csv files in the table
-            self.dbOperation.insert_data('training','training_raw_data_t')
-            # export data in table to csv file
-            self.dbOperation.export_csv('training','training_raw_data_t')
+            # skip the files already loaded in a previous run
+            file_hashes = self.skip_loaded_files('training') if incremental else None
+            if self.ingestion_config.workers > 1:
+                # create the table first, the files are validated and inserted as the worker processes finish
+                self.dbOperation.create_table('training','training_raw_data_t',column_names)
+                self.ingest_files_parallel(number_of_columns,'training','training_raw_data_t',file_hashes,
+                                           load_schema('schema_train'))
+            else:
+                # validating column length, missing values and types, normalising the missing values in one pass
+                self.validate_files(number_of_columns,load_schema('schema_train'))
+                # create database with given name, if present open the connection! Create table with columns given in schema
+                self.dbOperation.create_table('training','training_raw_data_t',column_names)
+                # insert csv files in the table
+                self.dbOperation.insert_data_bulk('training','training_raw_data_t',file_hashes)
+            # export data in table to csv file, or to columnar files read by the preprocessor without parsing
+            if self.ingestion_config.export_format == 'columnar':
+                self.dbOperation.export_columnar('training','training_raw_data_t',load_schema('schema_train'),
+                                                 compact=self.transformation_config.compact_dtypes)
+            elif incremental:
+                self.dbOperation.export_csv_incremental('training','training_raw_data_t')
+            else:
+                self.dbOperation.export_csv('training','training_raw_data_t')
             # move processed files
             self.move_processed_files()
             logging.info('End of Data Load, validation and transformation')
@@ -292,18 +317,24 @@ class LoadValidate:
             self.archive_old_files()
             # extracting values from schema
             column_names, number_of_columns = self.values_from_schema('schema_predict')
-            # validating column length in the file
-            self.validate_column_length(number_of_columns)
-            # validating if any column has all values missing
-            self.validate_missing_values()
-            # replacing blanks in the csv file with "Null" values
-            self.replace_missing_values()
-            # create database with given name, if present open the connection! Create table with columns given in schema
-            self.dbOperation.create_table('prediction','prediction_raw_data_t', column_names)
-            # insert csv files in the table
-            self.dbOperation.insert_data('prediction','prediction_raw_data_t')
-            # export data in table to csv file
-            self.dbOperation.export_csv('prediction','prediction_raw_data_t')
+            if self.ingestion_config.workers > 1:
+                # create the table first, the files are validated and inserted as the worker processes finish
+                self.dbOperation.create_table('prediction','prediction_raw_data_t', column_names)
+                self.ingest_files_parallel(number_of_columns,'prediction','prediction_raw_data_t',
+                                           schema=load_schema('schema_predict'))
+            else:
+                # validating column length, missing values and types, normalising the missing values in one pass
+                self.validate_files(number_of_columns,load_schema('schema_predict'))
+                # create database with given name, if present open the connection! Create table with columns given in schema
+                self.dbOperation.create_table('prediction','prediction_raw_data_t', column_names)
+                # insert csv files in the table
+                self.dbOperation.insert_data_bulk('prediction','prediction_raw_data_t')
+            # export data in table to csv file, or to columnar files read by the preprocessor without parsing
+            if self.ingestion_config.export_format == 'columnar':
+                self.dbOperation.export_columnar('prediction','prediction_raw_data_t',load_schema('schema_predict'),
+                                                 compact=self.transformation_config.compact_dtypes)
+            else:
+                self.dbOperation.export_csv('prediction','prediction_raw_data_t')
             # move processed files
             self.move_processed_files()
             logging.info('End of Data Load, validation and transformation')
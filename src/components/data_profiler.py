@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+from src.logger import logging
+from src.exception import CustomException
+
+PROFILE_PATH = os.path.join('artifacts', 'profiles')
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def _float(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+class DataProfiler:
+    """
+    *****************************************************************************
+    *
+    * filename:       data_profiler.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to profile a dataset in one vectorized pass: null counts, min/max/mean/std,
+    *                 quantiles and histograms of the numeric columns and frequencies of the categorical
+    *                 columns. Profiles of chunks can be merged, and the profiles of a run are stored per
+    *                 run_id so that the later stages reuse them instead of scanning the data again
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,run_id,data_path,mode,bins=10):
+        self.run_id = run_id
+        self.data_path = data_path
+        self.bins = bins
+
+    def profile(self,data):
+        """
+        * method: profile
+        * description: method to profile a pandas DataFrame
+        * return: dictionary with the number of rows and the statistics per column
+        *
+        *
+        * Parameters
+        *   data:
+        """
+        try:
+            logging.info('Start of profiling dataset...')
+            null_counts = data.isna().sum()
+            numeric = [column for column in data.columns if pd.api.types.is_numeric_dtype(data[column].dtype)]
+            values = data[numeric].to_numpy(dtype='float64', na_value=np.nan) if numeric else np.empty((len(data), 0))
+            counts = (~np.isnan(values)).sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                present = counts > 0
+                minimums = np.full(len(numeric), np.nan)
+                maximums = np.full(len(numeric), np.nan)
+                quantiles = np.full((len(QUANTILES), len(numeric)), np.nan)
+                if present.any():
+                    minimums[present] = np.nanmin(values[:, present], axis=0)
+                    maximums[present] = np.nanmax(values[:, present], axis=0)
+                    quantiles[:, present] = np.nanquantile(values[:, present], QUANTILES, axis=0)
+                sums = np.nansum(values, axis=0)
+                sums_sq = np.nansum(values ** 2, axis=0)
+            columns = {}
+            for i, column in enumerate(numeric):
+                stats = {'null_count': int(null_counts[column]), 'count': int(counts[i]), 'sum': float(sums[i]),
+                         'sum_sq': float(sums_sq[i]), 'min': _float(minimums[i]), 'max': _float(maximums[i]),
+                         'quantiles': [_float(q) for q in quantiles[:, i]], 'approximate': False}
+                if counts[i]:
+                    column_values = values[:, i]
+                    hist, edges = np.histogram(column_values[~np.isnan(column_values)], bins=self.bins)
+                    stats['histogram'] = {'edges': edges.tolist(), 'counts': hist.tolist()}
+                columns[column] = self.finish(stats)
+            for column in data.columns:
+                if column not in columns:
+                    frequencies = data[column].value_counts()
+                    columns[column] = {'null_count': int(null_counts[column]), 'count': int(frequencies.sum()),
+                                       'frequencies': {str(key): int(value) for key, value in frequencies.items()}}
+            logging.info('End of profiling dataset...')
+            return {'rows': len(data), 'columns': columns}
+        except Exception as e:
+            logging.info('Exception raised while profiling dataset')
+            raise CustomException(e,sys)
+
+    def finish(self,stats):
+        """
+        * method: finish
+        * description: method to derive the mean and standard deviation from the merged sums
+        * return: the column statistics
+        *
+        *
+        * Parameters
+        *   stats:
+        """
+        count = stats['count']
+        stats['mean'] = stats['sum'] / count if count else None
+        stats['std'] = float(np.sqrt(max(stats['sum_sq'] / count - stats['mean'] ** 2, 0))) if count else None
+        return stats
+
+    def merge(self,first,second):
+        """
+        * method: merge
+        * description: method to merge the profiles of two chunks. The histograms are re-binned on the
+        *              combined range and the quantiles are approximated from the merged histogram
+        * return: the merged profile
+        *
+        *
+        * Parameters
+        *   first:
+        *   second:
+        """
+        columns = {}
+        for column, a in first['columns'].items():
+            b = second['columns'][column]
+            merged = {'null_count': a['null_count'] + b['null_count'], 'count': a['count'] + b['count']}
+            if 'frequencies' in a:
+                frequencies = dict(a['frequencies'])
+                for key, value in b['frequencies'].items():
+                    frequencies[key] = frequencies.get(key, 0) + value
+                merged['frequencies'] = frequencies
+            else:
+                merged.update({'sum': a['sum'] + b['sum'], 'sum_sq': a['sum_sq'] + b['sum_sq'],
+                               'min': min(v for v in [a['min'], b['min']] if v is not None) if merged['count'] else None,
+                               'max': max(v for v in [a['max'], b['max']] if v is not None) if merged['count'] else None,
+                               'quantiles': [None] * len(QUANTILES), 'approximate': True})
+                histograms = [stats['histogram'] for stats in (a, b) if 'histogram' in stats]
+                if histograms:
+                    edges = np.linspace(merged['min'], merged['max'], self.bins + 1)
+                    cdf = sum(np.interp(edges, h['edges'], np.concatenate([[0], np.cumsum(h['counts'])])) for h in histograms)
+                    counts = np.diff(cdf)
+                    merged['histogram'] = {'edges': edges.tolist(), 'counts': counts.tolist()}
+                    merged['quantiles'] = [float(np.interp(q * cdf[-1], cdf, edges)) for q in QUANTILES]
+                merged = self.finish(merged)
+            columns[column] = merged
+        return {'rows': first['rows'] + second['rows'], 'columns': columns}
+
+    def profile_chunks(self,chunks):
+        """
+        * method: profile_chunks
+        * description: method to profile a dataset given in chunks by merging the profile of each chunk
+        * return: the merged profile
+        *
+        *
+        * Parameters
+        *   chunks: iterable of pandas DataFrames
+        """
+        result = None
+        for chunk in chunks:
+            chunk_profile = self.profile(chunk)
+            result = chunk_profile if result is None else self.merge(result, chunk_profile)
+        return result
+
+    def save(self,profile,name):
+        """
+        * method: save
+        * description: method to store a profile of the run
+        * return: none
+        *
+        *
+        * Parameters
+        *   profile:
+        *   name:
+        """
+        try:
+            path = os.path.join(PROFILE_PATH, self.run_id)
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, name + '.json'), 'w') as f:
+                json.dump(profile, f)
+            logging.info('Profile %s of run %s saved' % (name, self.run_id))
+        except Exception as e:
+            logging.info('Exception raised while saving profile')
+            raise CustomException(e,sys)
+
+    def load(self,name,run_id=None):
+        """
+        * method: load
+        * description: method to get a stored profile of a run
+        * return: the profile, None when the run has no profile of that name
+        *
+        *
+        * Parameters
+        *   name:
+        *   run_id: defaults to the current run
+        """
+        try:
+            path = os.path.join(PROFILE_PATH, run_id or self.run_id, name + '.json')
+            if not os.path.isfile(path):
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.info('Exception raised while loading profile')
+            raise CustomException(e,sys)
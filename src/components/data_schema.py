@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from src.logger import logging
+from src.exception import CustomException
+
+SCHEMA_PATH = os.path.join('artifacts', 'database')
+
+# pandas dtype of each schema type when the schema has no dtype for the column
+DEFAULT_DTYPES = {
+    'INTEGER': 'Int64',
+    'FLOAT': 'float64',
+    'VARCHAR': 'object'
+}
+
+
+class DataSchema:
+    """
+    *****************************************************************************
+    *
+    * filename:       data_schema.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for a schema file compiled into pandas dtypes and vectorized type checks
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,schema):
+        self.column_names = schema['ColName']
+        self.number_of_columns = schema['NumberofColumns']
+        self.categories = schema.get('ColCategories', {})
+        self.dtypes = {}
+        for column, type in self.column_names.items():
+            if column in self.categories:
+                self.dtypes[column] = pd.CategoricalDtype(self.categories[column])
+            else:
+                self.dtypes[column] = pd.api.types.pandas_dtype(schema.get('ColDtype', {}).get(column, DEFAULT_DTYPES[type]))
+
+    def dtypes_for(self,columns):
+        """
+        * method: dtypes_for
+        * description: method to get the dtypes of the given columns, to be passed to read_csv
+        * return: dictionary of dtype per column
+        *
+        *
+        * Parameters
+        *   columns:
+        """
+        return {column: self.dtypes[column] for column in columns if column in self.dtypes}
+
+    def validate(self,data):
+        """
+        * method: validate
+        * description: method to check that the values of a chunk read as text can be converted to the
+        *              schema dtypes: numbers for the numeric columns, whole numbers in the dtype range for
+        *              the integer columns and known categories for the categorical columns
+        * return: None if the chunk is valid, otherwise the reason for rejecting it
+        *
+        *
+        * Parameters
+        *   data:
+        """
+        for column in data.columns:
+            if column not in self.dtypes:
+                continue
+            values = data[column]
+            present = values.notna()
+            dtype = self.dtypes[column]
+            if isinstance(dtype, pd.CategoricalDtype):
+                invalid = (present & ~values.isin(dtype.categories)).any()
+            elif self.column_names[column] in ('INTEGER', 'FLOAT'):
+                numbers = pd.to_numeric(values, errors='coerce')
+                invalid = (present & numbers.isna()).any()
+                if not invalid and pd.api.types.is_integer_dtype(dtype):
+                    numbers = numbers.dropna()
+                    bounds = np.iinfo(getattr(dtype, 'numpy_dtype', dtype))
+                    invalid = ((numbers % 1 != 0) | (numbers < bounds.min) | (numbers > bounds.max)).any()
+            else:
+                continue
+            if invalid:
+                return 'Invalid Type in Column %s' % column
+        return None
+
+
+@lru_cache(maxsize=None)
+def _compile_schema(schema_path,modified_time):
+    with open(schema_path, 'r') as f:
+        return DataSchema(json.load(f))
+
+
+def load_schema(schema_file):
+    """
+    * method: load_schema
+    * description: method to get the compiled schema, the schema file is read again only when it changes
+    * return: DataSchema
+    *
+    *
+    * Parameters
+    *   schema_file:
+    """
+    try:
+        schema_path = os.path.join(SCHEMA_PATH, schema_file + '.json')
+        return _compile_schema(os.path.abspath(schema_path), os.path.getmtime(schema_path))
+    except Exception as e:
+        logging.info('Exception raised while Loading Schema: %s' % e)
+        raise CustomException(e,sys)
@@ -1,11 +1,35 @@
 import pandas as pd
 import numpy as np
 import sys
+import os
 import json
+import hashlib
+from dataclasses import dataclass, asdict
 from sklearn.impute import KNNImputer
+from src.components.data_schema import load_schema, SCHEMA_PATH
+from src.components.feature_encoder import FeatureEncoder
+from src.components.data_imputation import ImputationEngine
+from src.components.data_profiler import DataProfiler
+from src.components.preprocess_cache import PreprocessCache
+from src.utils import FileOperation, get_file_hash
 from src.logger import logging
 from src.exception import CustomException
 
+@dataclass
+class DataTransformationConfig:
+    imputation_strategy: str='knn'
+    n_neighbors: int=3
+    imputation_chunk_size: int=10000
+    max_donors: int=0
+    compact_dtypes: bool=False
+    use_cache: bool=True
+    cache_path: str=os.path.join('artifacts','preprocess_cache')
+    cache_max_bytes: int=2 * 1024 ** 3
+    predict_chunk_size: int=50000
+
+# version of the preprocessing steps, to be increased when a change alters the preprocessed training sets
+PREPROCESSING_VERSION = 3
+
 class Preprocessor:
     """
     *****************************************************************************
@@ -27,6 +51,13 @@ class Preprocessor:
     def __init__(self,run_id,data_path,mode):
         self.run_id = run_id
         self.data_path = data_path
+        self.schema_file = 'schema_predict' if mode == 'prediction' else 'schema_train'
+        self.fileOperation = FileOperation(self.run_id, self.data_path, mode)
+        self.encoder = None
+        self.imputer = None
+        self.profiler = DataProfiler(self.run_id, self.data_path, mode)
+        self.memory_report = {}
+        self.transformation_config = DataTransformationConfig()
 
     def get_data(self):
         """
@@ -39,15 +70,269 @@ class Preprocessor:
         *   none:
         """
         try:
-            # reading the data file
             logging.info('Start of reading dataset...')
-            self.data= pd.read_csv(self.data_path+'_validation/InputFile.csv')
+            source, path = self.input_source()
+            if source == 'columnar':
+                self.data= self.read_columnar(path)
+            else:
+                self.data= pd.read_csv(path, dtype=self.csv_dtypes(path))
+            if self.transformation_config.compact_dtypes:
+                self.data = self.compact_frame(self.data)
             logging.info('End of reading dataset...')
             return self.data
         except Exception as e:
             logging.exception('Exception raised while reading dataset')
             raise CustomException(e,sys)
 
+    def iter_data(self,chunk_size):
+        """
+        * method: iter_data
+        * description: method to read the datafile a slice at a time, with the same dtypes and row index as get_data
+        * return: generator of pandas DataFrames
+        *
+        *
+        * Parameters
+        *   chunk_size: number of rows per slice
+        """
+        source, path = self.input_source()
+        if source == 'columnar':
+            with open(path+'meta.json', 'r') as f:
+                rows = json.load(f)['rows']
+            chunks = (self.read_columnar(path, start, start + chunk_size) for start in range(0, rows, chunk_size))
+        else:
+            chunks = pd.read_csv(path, dtype=self.csv_dtypes(path), chunksize=chunk_size)
+        for chunk in chunks:
+            yield self.compact_frame(chunk) if self.transformation_config.compact_dtypes else chunk
+
+    def csv_dtypes(self,path):
+        """
+        * method: csv_dtypes
+        * description: method to get the dtypes compiled from the schema for the columns of a csv file, so that
+        *              the columns are parsed straight into them
+        * return: dictionary of dtype per column
+        *
+        *
+        * Parameters
+        *   path:
+        """
+        schema = load_schema(self.schema_file)
+        dtypes = schema.dtypes_for(pd.read_csv(path, nrows=0).columns)
+        if self.transformation_config.compact_dtypes:
+            dtypes = {column: 'float32' if dtype == 'float64' else dtype for column, dtype in dtypes.items()}
+        return dtypes
+
+    def input_source(self):
+        """
+        * method: input_source
+        * description: method to choose the validated data file, the columnar export is used when it is at
+        *              least as recent as the csv export
+        * return: tuple of the source format, columnar or csv, and its path
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        columnar_path = self.data_path+'_validation/InputFile.columns/'
+        csv_path = self.data_path+'_validation/InputFile.csv'
+        if os.path.isfile(columnar_path+'meta.json') and (not os.path.isfile(csv_path) or
+                                                         os.path.getmtime(columnar_path+'meta.json') >= os.path.getmtime(csv_path)):
+            return 'columnar', columnar_path
+        return 'csv', csv_path
+
+    def input_files(self):
+        """
+        * method: input_files
+        * description: method to list the files of the validated set
+        * return: list of file paths
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        source, path = self.input_source()
+        return [os.path.join(path, f) for f in sorted(os.listdir(path))] if source == 'columnar' else [path]
+
+    def input_stamp(self):
+        """
+        * method: input_stamp
+        * description: method to identify the version of the validated set by the size and modification time of its files
+        * return: list of file path, size and modification time
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        return [[f, os.path.getsize(f), os.path.getmtime(f)] for f in self.input_files()]
+
+    def raw_profile(self,name,data=None):
+        """
+        * method: raw_profile
+        * description: method to get the profile of the loaded validated set. The profile stored with the run is
+        *              reused while the input files are unchanged, otherwise the data is profiled once and stored
+        * return: the profile
+        *
+        *
+        * Parameters
+        *   name: name of the profile, train_raw or predict_raw
+        *   data: the loaded validated set, read when not given
+        """
+        try:
+            source = self.input_stamp()
+            profile = self.profiler.load(name)
+            if profile is None or profile.get('source') != source:
+                profile = self.profiler.profile(self.get_data() if data is None else data)
+                profile['source'] = source
+                self.profiler.save(profile, name)
+            return profile
+        except Exception as e:
+            logging.info('Exception raised while profiling the validated set')
+            raise CustomException(e,sys)
+
+    def null_counts_from(self,profile,columns):
+        """
+        * method: null_counts_from
+        * description: method to take the null counts of the features from the profile of the raw set, the
+        *              one-hot columns encode missing categories as zeros and have no null values
+        * return: pandas Series of null counts per column
+        *
+        *
+        * Parameters
+        *   profile:
+        *   columns: columns of the features
+        """
+        stats = profile['columns']
+        return pd.Series([stats[column]['null_count'] if column in stats else 0 for column in columns],
+                         index=columns, dtype='int64')
+
+    def cache_key(self):
+        """
+        * method: cache_key
+        * description: method to compute the content key of the preprocessed training set from the hash of the
+        *              input files and the schema, the preprocessing version and the transformation settings
+        * return: sha256 hex digest
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        digest = hashlib.sha256()
+        for f in self.input_files() + [os.path.join(SCHEMA_PATH, self.schema_file + '.json')]:
+            digest.update(get_file_hash(f).encode())
+        settings = {key: value for key, value in asdict(self.transformation_config).items()
+                    if key not in ('use_cache', 'cache_path', 'cache_max_bytes')}
+        digest.update(json.dumps([PREPROCESSING_VERSION, settings], sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def feature_dtype(self):
+        """
+        * method: feature_dtype
+        * description: method to get the float dtype of the feature matrix, in compact mode the integer and
+        *              one-hot columns keep their narrow dtypes
+        * return: float32 in compact mode, otherwise float64
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        return 'float32' if self.transformation_config.compact_dtypes else 'float64'
+
+    def compact_frame(self,data):
+        """
+        * method: compact_frame
+        * description: method to downcast the floats to float32, the integers to the smallest integer type of
+        *              their range and the text columns to categories, the schema categories when it has them
+        * return: A pandas DataFrame
+        *
+        *
+        * Parameters
+        *   data:
+        """
+        try:
+            schema = load_schema(self.schema_file)
+            columns = {}
+            for column in data.columns:
+                values = data[column]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    pass
+                elif pd.api.types.is_float_dtype(values.dtype):
+                    values = values.astype('float32')
+                elif pd.api.types.is_integer_dtype(values.dtype) and values.notna().any():
+                    minimum, maximum = values.min(), values.max()
+                    dtype = next(t for t in ['int8', 'int16', 'int32', 'int64']
+                                 if np.iinfo(t).min <= minimum and maximum <= np.iinfo(t).max)
+                    # nullable integer columns keep their missing values
+                    values = values.astype(dtype.capitalize() if values.hasnans else dtype)
+                elif not pd.api.types.is_numeric_dtype(values.dtype):
+                    dtype = schema.dtypes.get(column)
+                    values = values.astype(dtype if isinstance(dtype, pd.CategoricalDtype) else 'category')
+                columns[column] = values
+            return pd.DataFrame(columns, index=data.index)
+        except Exception as e:
+            logging.info('Exception raised while compacting dataset')
+            raise CustomException(e,sys)
+
+    def record_memory(self,stage,data):
+        """
+        * method: record_memory
+        * description: method to record the memory footprint of the data at a preprocessing stage
+        * return: memory footprint in bytes
+        *
+        *
+        * Parameters
+        *   stage:
+        *   data: pandas DataFrame, Series or numpy array
+        """
+        if isinstance(data, pd.DataFrame):
+            size = int(data.memory_usage(index=False, deep=True).sum())
+        elif isinstance(data, pd.Series):
+            size = int(data.memory_usage(index=False, deep=True))
+        else:
+            size = int(data.nbytes)
+        self.memory_report[stage] = size
+        logging.info('Memory footprint %s: %.2f MB' % (stage, size / 2 ** 20))
+        return size
+
+    def read_columnar(self,path,start=0,stop=None):
+        """
+        * method: read_columnar
+        * description: method to read the columnar export, or the rows from start to stop of it. The numeric
+        *              columns, the masks of the nullable integers and the codes of the categorical columns are
+        *              memory-mapped without copy, one array per column so that pandas does not consolidate
+        *              them; the string columns are converted to objects with the empty strings as missing values
+        * return: A pandas DataFrame
+        *
+        *
+        * Parameters
+        *   path:
+        *   start:
+        *   stop:
+        """
+        try:
+            logging.info('Start of reading columnar dataset...')
+            with open(path+'meta.json', 'r') as f:
+                meta = json.load(f)
+            stop = meta['rows'] if stop is None else min(stop, meta['rows'])
+            columns = {}
+            for column in meta['columns']:
+                array = np.load(path+column['file'], mmap_mode='r')[start:stop]
+                if 'categories' in column:
+                    array = pd.Categorical.from_codes(array, categories=column['categories'])
+                elif column.get('nullable'):
+                    mask = (np.load(path+column['mask'], mmap_mode='r')[start:stop] if 'mask' in column
+                            else np.zeros(len(array), dtype=bool))
+                    array = pd.arrays.IntegerArray(array, mask)
+                elif array.dtype.kind == 'U':
+                    values = array.astype(object)
+                    values[array == ''] = np.nan
+                    array = values
+                columns[column['name']] = array
+            data = pd.DataFrame(columns, index=pd.RangeIndex(start, stop), copy=False)
+            logging.info('End of reading columnar dataset...')
+            return data
+        except Exception as e:
+            logging.exception('Exception raised while reading columnar dataset')
+            raise CustomException(e,sys)
+
     def drop_columns(self,data,columns):
         """
         * method: drop_columns
@@ -70,10 +355,10 @@ class Preprocessor:
             logging.info('Exception raised while Droping Columns')
             raise CustomException(e,sys)
 
-    def is_null_present(self,data):
+    def is_null_present(self,data,profile=None):
         """
         * method: is_null_present
-        * description: method to check null values
+        * description: method to check null values, counted from the profile of the raw set when given
         * return: Returns a Boolean Value. True if null values are present in the DataFrame, False if they are not present.
         *
         * who             when           version  change (include bug# if apply)
@@ -82,19 +367,20 @@ class Preprocessor:
         *
         * Parameters
         *   data:
+        *   profile: profile of the raw set the features were built from
         """
         self.null_present = False
         try:
             logging.info('Start of finding missing values...')
-            self.null_counts=data.isna().sum() # check for the count of null values per column
-            for i in self.null_counts:
-                if i>0:
-                    self.null_present=True
-                    break
+            if profile is not None:
+                self.null_counts = self.null_counts_from(profile, data.columns)
+            else:
+                self.null_counts=data.isna().sum() # check for the count of null values per column
+            self.null_present = bool((self.null_counts > 0).any())
             if(self.null_present): # write the logs to see which columns have null values
                 dataframe_with_null = pd.DataFrame()
                 dataframe_with_null['columns'] = data.columns
-                dataframe_with_null['missing values count'] = np.asarray(data.isna().sum())
+                dataframe_with_null['missing values count'] = self.null_counts.to_numpy()
                 dataframe_with_null.to_csv(self.data_path+'_validation/'+'null_values.csv') # storing the null column information to file
             logging.info('End of finding missing values...')
             return self.null_present
@@ -105,7 +391,8 @@ class Preprocessor:
     def impute_missing_values(self, data):
         """
         * method: impute_missing_values
-        * description: method to impute missing values
+        * description: method to impute missing values, with the imputation engine fitted on the training data
+        *              when there is one, otherwise with a KNN imputer fitted on the given data
         * return: none
         *
         *
@@ -115,8 +402,12 @@ class Preprocessor:
         self.data= data
         try:
             logging.info('Start of imputing missing values...')
+            if self.imputer is not None:
+                self.new_data = self.imputer.transform(self.data)
+                logging.info('End of imputing missing values...')
+                return self.new_data
             imputer=KNNImputer(n_neighbors=3, weights='uniform',missing_values=np.nan)
-            self.new_array=imputer.fit_transform(self.data) # impute the missing values
+            self.new_array=imputer.fit_transform(self.data.astype('float64')) # impute the missing values
             # convert the nd-array returned in the step above to a Data frame
             self.new_data=pd.DataFrame(data=self.new_array, columns=self.data.columns)
             logging.info('End of imputing missing values...')
@@ -137,7 +428,7 @@ class Preprocessor:
         """
         try:
             logging.info('Start of feature encoding...')
-            self.new_data = data.select_dtypes(include=['object']).copy()
+            self.new_data = data.select_dtypes(include=['object', 'category']).copy()
             # Using the dummy encoding to encode the categorical columns to numerical ones
             for col in self.new_data.columns:
                 self.new_data = pd.get_dummies(self.new_data, columns=[col], prefix=[col], drop_first=True)
@@ -149,6 +440,72 @@ class Preprocessor:
             raise CustomException(e,sys)
 
 
+    def save_encoder(self,model_name):
+        """
+        * method: save_encoder
+        * description: method to save the fitted feature encoder next to the model
+        * return: none
+        *
+        *
+        * Parameters
+        *   model_name:
+        """
+        self.fileOperation.save_artifact(self.encoder, model_name, 'encoder')
+
+    def load_encoder(self,model_name):
+        """
+        * method: load_encoder
+        * description: method to load the feature encoder fitted with the model, used by the predict methods
+        * return: the feature encoder
+        *
+        *
+        * Parameters
+        *   model_name:
+        """
+        self.encoder = self.fileOperation.load_artifact(model_name, 'encoder')
+        return self.encoder
+
+    def fit_imputer(self,data):
+        """
+        * method: fit_imputer
+        * description: method to fit the imputation engine on the training features
+        * return: the imputation engine
+        *
+        *
+        * Parameters
+        *   data:
+        """
+        config = self.transformation_config
+        self.imputer = ImputationEngine(strategy=config.imputation_strategy, n_neighbors=config.n_neighbors,
+                                        chunk_size=config.imputation_chunk_size, max_donors=config.max_donors,
+                                        dtype=self.feature_dtype()).fit(data)
+        return self.imputer
+
+    def save_imputer(self,model_name):
+        """
+        * method: save_imputer
+        * description: method to save the fitted imputation engine next to the model
+        * return: none
+        *
+        *
+        * Parameters
+        *   model_name:
+        """
+        self.fileOperation.save_artifact(self.imputer, model_name, 'imputer')
+
+    def load_imputer(self,model_name):
+        """
+        * method: load_imputer
+        * description: method to load the imputation engine fitted with the model, used by the predict methods
+        * return: the imputation engine
+        *
+        *
+        * Parameters
+        *   model_name:
+        """
+        self.imputer = self.fileOperation.load_artifact(model_name, 'imputer')
+        return self.imputer
+
     def split_features_label(self, data, label_name):
         """
         * method: split_features_label
@@ -165,6 +522,9 @@ class Preprocessor:
             logging.info('Start of splitting features and label ...')
             self.X=self.data.drop(labels=label_name,axis=1) # drop the columns specified and separate the feature columns
             self.y=self.data[label_name] # Filter the Label columns
+            if pd.api.types.is_extension_array_dtype(self.y.dtype) and pd.api.types.is_integer_dtype(self.y.dtype):
+                # the nullable integer label of the schema is given to the models as a plain integer column
+                self.y = self.y.astype(self.y.dtype.numpy_dtype)
             logging.info('End of splitting features and label ...')
             return self.X,self.y
         except Exception as e:
@@ -208,22 +568,41 @@ class Preprocessor:
         """
         try:
             logging.info('Start of Preprocessing...')
+            config = self.transformation_config
+            if config.use_cache:
+                # an unchanged input preprocessed by the same version is taken from the cache as is
+                cache = PreprocessCache(config.cache_path, config.cache_max_bytes)
+                key = self.cache_key()
+                entry = cache.get(key)
+                if entry is not None:
+                    self.X, self.y, self.encoder, self.imputer = entry
+                    logging.info('End of Preprocessing...')
+                    return self.X, self.y
             # get data into pandas data frame
             data=self.get_data()
+            self.record_memory('loaded', data)
+            profile = self.raw_profile('train_raw', data)
             # drop unwanted columns
             data=self.drop_columns(data,['empid'])
-            # handle label encoding
-            cat_df = self.feature_encoding(data)
-            data = pd.concat([data, cat_df], axis=1)
-            # drop categorical column
-            data = self.drop_columns(data, ['salary'])
+            # create separate features and labels
+            features, label = self.split_features_label(data, label_name='left')
+            # fit the encoder on the features, it is saved with the model to encode the predict sets
+            self.encoder = FeatureEncoder().fit(features)
+            data = self.encoder.transform_frame(features, self.feature_dtype(), self.transformation_config.compact_dtypes)
+            self.record_memory('encoded', data)
+            # fit the imputer on the training features, it is saved with the model to impute the predict sets
+            self.fit_imputer(data)
             # check if missing values are present in the data set
-            is_null_present = self.is_null_present(data)
+            is_null_present = self.is_null_present(data, profile)
             # if missing values are there, replace them appropriately.
             if (is_null_present):
                 data = self.impute_missing_values(data)  # missing value imputation
-            # create separate features and labels
-            self.X, self.y = self.split_features_label(data, label_name='left')
+            self.record_memory('imputed', data)
+            self.record_memory('label', label)
+            self.profiler.save(self.memory_report, 'train_memory')
+            self.X, self.y = data, label
+            if config.use_cache:
+                cache.put(key, (self.X, self.y, self.encoder, self.imputer))
             logging.info('End of Preprocessing...')
             return self.X, self.y
         except Exception as e:
@@ -244,20 +623,30 @@ class Preprocessor:
             logging.info('Start of Preprocessing...')
             # get data into pandas data frame
             data=self.get_data()
+            self.record_memory('loaded', data)
+            profile = self.raw_profile('predict_raw', data)
             # drop unwanted columns
             #data=self.drop_columns(data,['empid'])
-            # handle label encoding
-            cat_df = self.feature_encoding(data)
-            data = pd.concat([data, cat_df], axis=1)
-            # drop categorical column
-            data = self.drop_columns(data, ['salary'])
+            if self.encoder is not None:
+                # build the features in the fitted layout in one pass
+                data = self.encoder.transform_frame(data, self.feature_dtype(), self.transformation_config.compact_dtypes)
+            else:
+                # handle label encoding
+                cat_df = self.feature_encoding(data)
+                data = pd.concat([data, cat_df], axis=1)
+                # drop categorical column
+                data = self.drop_columns(data, ['salary'])
             # check if missing values are present in the data set
-            is_null_present = self.is_null_present(data)
+            is_null_present = self.is_null_present(data, profile)
+            self.record_memory('encoded', data)
             # if missing values are there, replace them appropriately.
             if (is_null_present):
                 data = self.impute_missing_values(data)  # missing value imputation
+            self.record_memory('imputed', data)
+            self.profiler.save(self.memory_report, 'predict_memory')
 
-            data = self.final_predictset(data)
+            if self.encoder is None:
+                data = self.final_predictset(data)
             logging.info('End of Preprocessing...')
             return data
         except Exception as e:
@@ -265,6 +654,67 @@ class Preprocessor:
             raise CustomException(e,sys)
 
 
+    def preprocess_records(self,records):
+        """
+        * method: preprocess_records
+        * description: method to pre-process one or a few records for online scoring. The features are built
+        *              from the fitted encoder layout and imputed with the fitted imputer without pandas, so
+        *              load_encoder and load_imputer must have been called
+        * return: numpy array of features
+        *
+        *
+        * Parameters
+        *   records: a dictionary or a list of dictionaries of column values
+        """
+        try:
+            # no logging on this path, a log record costs more than building the features
+            features = self.encoder.transform_records(records)
+            if self.imputer is not None and np.isnan(features).any():
+                features = self.imputer.transform_array(features)
+            return features
+        except Exception as e:
+            logging.info('Exception raised while preprocessing records')
+            raise CustomException(e,sys)
+
+    def iter_predictset(self,chunk_size=None):
+        """
+        * method: iter_predictset
+        * description: method to pre-process prediction data a slice at a time, with constant memory. The slices
+        *              are encoded and imputed with the fitted encoder and imputer, so load_encoder and
+        *              load_imputer must have been called; the concatenated slices equal preprocess_predictset
+        * return: generator of pandas DataFrames
+        *
+        *
+        * Parameters
+        *   chunk_size: number of rows per slice, defaults to the configured predict_chunk_size
+        """
+        try:
+            logging.info('Start of Preprocessing in chunks...')
+            if self.encoder is None or self.imputer is None:
+                raise ValueError('iter_predictset needs the fitted encoder and imputer of the model')
+            profile = None
+            null_counts = None
+            for data in self.iter_data(chunk_size or self.transformation_config.predict_chunk_size):
+                # the profiles of the raw slices are merged into the profile of the whole set
+                chunk_profile = self.profiler.profile(data)
+                profile = chunk_profile if profile is None else self.profiler.merge(profile, chunk_profile)
+                data = self.encoder.transform_frame(data, self.feature_dtype(), self.transformation_config.compact_dtypes)
+                chunk_null_counts = self.null_counts_from(chunk_profile, data.columns)
+                null_counts = chunk_null_counts if null_counts is None else null_counts + chunk_null_counts
+                if (chunk_null_counts > 0).any():
+                    data = self.imputer.transform(data)
+                yield data
+            if profile is not None:
+                profile['source'] = self.input_stamp()
+                self.profiler.save(profile, 'predict_raw')
+            if null_counts is not None and (null_counts > 0).any():
+                null_counts.rename_axis('columns').reset_index(name='missing values count').to_csv(
+                    self.data_path+'_validation/'+'null_values.csv')
+            logging.info('End of Preprocessing in chunks...')
+        except Exception as e:
+            logging.info('Unsuccessful End of Preprocessing in chunks...')
+            raise CustomException(e,sys)
+
     def preprocess_predict(self,data):
         """
         * method: preprocess_predict
@@ -280,17 +730,22 @@ class Preprocessor:
         """
         try:
             logging.info('Start of Preprocessing...')
-            cat_df = self.feature_encoding(data)
-            data = pd.concat([data, cat_df], axis=1)
-            # drop categorical column
-            data = self.drop_columns(data, ['salary'])
+            if self.encoder is not None:
+                # build the features in the fitted layout in one pass
+                data = self.encoder.transform_frame(data, self.feature_dtype(), self.transformation_config.compact_dtypes)
+            else:
+                cat_df = self.feature_encoding(data)
+                data = pd.concat([data, cat_df], axis=1)
+                # drop categorical column
+                data = self.drop_columns(data, ['salary'])
             # check if missing values are present in the data set
             is_null_present = self.is_null_present(data)
             # if missing values are there, replace them appropriately.
             if (is_null_present):
                 data = self.impute_missing_values(data)  # missing value imputation
 
-            data = self.final_predictset(data)
+            if self.encoder is None:
+                data = self.final_predictset(data)
             logging.info('End of Preprocessing...')
             return data
         except Exception as e:
@@ -1,8 +1,15 @@
 import sqlite3
 import csv
+import json
+import numpy as np
+import pandas as pd
+from itertools import islice
 from os import listdir
 import shutil
 import os
+import atexit
+import threading
+from datetime import datetime
 from dataclasses import dataclass
 
 import sys
@@ -12,8 +19,136 @@ from src.logger import logging
 @dataclass
 class DataIngestionConfig:
     raw_data_path: str=os.path.join('artifacts',"data.csv") 
+    database_path: str=os.path.join('artifacts',"database")
+    batch_size: int=5000
+    journal_mode: str='WAL'
+    synchronous: str='NORMAL'
+    cache_size: int=-64000
+    export_chunk_size: int=10000
+    cached_statements: int=256
 
 
+class ConnectionManager:
+    """
+    *****************************************************************************
+    *
+    * file_name:       DatabaseOperation.py
+    * version:        1.0
+    * author:         BryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to keep one configured connection per database, process and thread.
+    *                 The pragmas are applied once when the connection is opened, the statements are
+    *                 cached by sqlite3 on the connection. The connections of the threads that have ended
+    *                 are closed when a new connection is opened, and all the connections at exit
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        atexit.register(self.close_all)
+
+    def reset(self):
+        """
+        * method: reset
+        * description: method to forget the connections, used in a forked process where the connections
+        *              of the parent process must not be used
+        * return: none
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        self.pid = os.getpid()
+        self.local = threading.local()
+        self.connections = []
+        self.created_paths = set()
+
+    def get_connection(self,db_path,database_name,config):
+        """
+        * method: get_connection
+        * description: method to get the connection of the current thread, opening it on first use
+        * return: Connection to the DB
+        *
+        *
+        * Parameters
+        *   db_path:
+        *   database_name:
+        *   config:
+        """
+        if self.pid != os.getpid():
+            self.reset()
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            connections = self.local.connections = {}
+        db_file = os.path.abspath(os.path.join(db_path, database_name + '.db'))
+        conn = connections.get(db_file)
+        if conn is None:
+            if db_path not in self.created_paths:
+                os.makedirs(db_path, exist_ok=True)
+                self.created_paths.add(db_path)
+            # each connection is only used by its thread, it may be closed by close_all from any thread
+            conn = sqlite3.connect(db_file, cached_statements=config.cached_statements, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=%s" % config.journal_mode)
+            conn.execute("PRAGMA synchronous=%s" % config.synchronous)
+            conn.execute("PRAGMA cache_size=%d" % config.cache_size)
+            connections[db_file] = conn
+            with self.lock:
+                self.prune()
+                self.connections.append((threading.current_thread(), conn))
+            logging.info("Opened %s database successfully" % database_name)
+        return conn
+
+    def prune(self):
+        """
+        * method: prune
+        * description: method to close the connections of the threads that have ended, called under the lock
+        * return: number of closed connections
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        ended = [(thread, conn) for thread, conn in self.connections if not thread.is_alive()]
+        for thread, conn in ended:
+            conn.close()
+            self.connections.remove((thread, conn))
+        if ended:
+            logging.info("Closed %d database connections of ended threads" % len(ended))
+        return len(ended)
+
+    def close_all(self):
+        """
+        * method: close_all
+        * description: method to close all the connections opened by this process, by any of its threads
+        * return: none
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        if self.pid != os.getpid():
+            return
+        try:
+            with self.lock:
+                while self.connections:
+                    self.connections[-1][1].close()
+                    self.connections.pop()
+                self.local = threading.local()
+            logging.info("Closed all database connections")
+        except Exception as e:
+            logging.info("Exception raised while closing the database connections")
+            raise CustomException(e,sys)
+
+
+connection_manager = ConnectionManager()
+
 
 class DatabaseOperation:
     """
@@ -44,19 +179,15 @@ class DatabaseOperation:
     def database_connection(self,database_name):
         """
         * method: database_connection
-        * description: method to build database connection
+        * description: method to get the persistent database connection of the current thread
         * return: Connection to the DB
         *
         *
         * Parameters
         *   database_name:
         """
-        db_path = 'artifacts/database/'
-        if not os.path.exists(db_path):
-            os.makedirs(db_path)
         try:
-            conn = sqlite3.connect(os.path.join(db_path, database_name + '.db'))
-            logging.info("Opened %s database successfully" % database_name)
+            conn = connection_manager.get_connection(self.ingestion_config.database_path, database_name, self.ingestion_config)
         except Exception as e:
             logging.info("Error while connecting to database")
             raise CustomException(e, sys)
@@ -84,9 +215,7 @@ class DatabaseOperation:
             c=conn.cursor()
             c.execute("SELECT count(name) FROM sqlite_master WHERE type = 'table' AND name = '"+table_name+"'")
             if c.fetchone()[0] ==1:
-                conn.close()
                 logging.info('Tables created successfully')
-                logging.info("Closed %s database successfully" % database_name)
             else:
                 for key in column_names.keys():
                     type = column_names[key]
@@ -99,7 +228,6 @@ class DatabaseOperation:
                     except:
                         conn.execute("CREATE TABLE  "+table_name+" ({column_name} {dataType})".format(column_name=key, dataType=type))
                         logging.info("CREATE TABLE "+table_name+" column_name")
-                conn.close()
             logging.info('End of Creating Table...')
         except Exception as e:
             logging.info('Exception raised while Creating Table')
@@ -142,11 +270,138 @@ class DatabaseOperation:
                 conn.rollback()
                 logging.info('Exception raised while Inserting Data into Table')
                 shutil.move(good_data_path+'/' + file, bad_data_path)
-                conn.close()
                 raise CustomException(e,sys)
-        conn.close()
         logging.info('End of Inserting Data into Table...')
 
+    def create_manifest(self,database_name):
+        """
+        * method: create_manifest
+        * description: method to create the manifest of loaded files and the export state tables
+        * return: none
+        *
+        *
+        * Parameters
+        *   database_name:
+        """
+        try:
+            logging.info("Start of Creating Manifest...")
+            conn = self.database_connection(database_name)
+            conn.execute("CREATE TABLE IF NOT EXISTS ingestion_manifest_t (file_hash VARCHAR PRIMARY KEY, "
+                         "file_name VARCHAR, table_name VARCHAR, row_count INTEGER, first_rowid INTEGER, "
+                         "last_rowid INTEGER, run_id VARCHAR, loaded_at VARCHAR)")
+            conn.execute("CREATE TABLE IF NOT EXISTS export_state_t (table_name VARCHAR PRIMARY KEY, "
+                         "export_file VARCHAR, last_rowid INTEGER)")
+            conn.commit()
+            logging.info("End of Creating Manifest...")
+        except Exception as e:
+            logging.info('Exception raised while Creating Manifest')
+            raise CustomException(e,sys)
+
+    def is_file_loaded(self,conn,file_hash):
+        """
+        * method: is_file_loaded
+        * description: method to check if a file content is already recorded in the manifest
+        * return: True if the file content is already loaded
+        *
+        *
+        * Parameters
+        *   conn:
+        *   file_hash:
+        """
+        return conn.execute("SELECT 1 FROM ingestion_manifest_t WHERE file_hash = ?", (file_hash,)).fetchone() is not None
+
+    def record_manifest(self,conn,table_name,file,file_hash,row_count,first_rowid):
+        """
+        * method: record_manifest
+        * description: method to record a loaded file in the manifest. The rows of a previous version
+        *              of the same file are deleted and the export of the table is marked for rebuild
+        * return: none
+        *
+        *
+        * Parameters
+        *   conn:
+        *   table_name:
+        *   file:
+        *   file_hash:
+        *   row_count:
+        *   first_rowid:
+        """
+        previous = conn.execute("SELECT first_rowid, last_rowid FROM ingestion_manifest_t "
+                                "WHERE table_name = ? AND file_name = ?", (table_name, file)).fetchall()
+        for old_first_rowid, old_last_rowid in previous:
+            conn.execute("DELETE FROM "+table_name+" WHERE rowid BETWEEN ? AND ?", (old_first_rowid, old_last_rowid))
+            logging.info("Replaced the previous version of %s" % file)
+        if previous:
+            conn.execute("DELETE FROM ingestion_manifest_t WHERE table_name = ? AND file_name = ?", (table_name, file))
+            conn.execute("DELETE FROM export_state_t WHERE table_name = ?", (table_name,))
+        conn.execute("INSERT INTO ingestion_manifest_t values (?,?,?,?,?,?,?,?)",
+                     (file_hash, file, table_name, row_count, first_rowid, first_rowid + row_count - 1,
+                      self.run_id, datetime.now().isoformat()))
+
+    def insert_rows(self,conn,table_name,file,rows,file_hash=None):
+        """
+        * method: insert_rows
+        * description: method to insert the rows of one file into table with parameterized batched inserts
+        *              in a single transaction. Empty values (and the legacy "NULL" text) are stored as SQL NULLs
+        *              and the other values are stored typed by the column affinity of the table.
+        *              A failing file is rolled back and moved to the rejects.
+        *              When file_hash is given the file is recorded in the manifest in the same transaction
+        * return: number of inserted rows
+        *
+        *
+        * Parameters
+        *   conn:
+        *   table_name:
+        *   file:
+        *   rows:
+        *   file_hash:
+        """
+        rows = iter(rows)
+        count = 0
+        try:
+            number_of_columns = len(conn.execute("PRAGMA table_info('"+table_name+"')").fetchall())
+            sql_insert = "INSERT INTO "+table_name+" values ({values})".format(
+                values=','.join(["NULLIF(NULLIF(?, ''), 'NULL')"] * number_of_columns))
+            first_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM "+table_name).fetchone()[0]
+            while True:
+                batch = list(islice(rows, self.ingestion_config.batch_size))
+                if not batch:
+                    break
+                conn.executemany(sql_insert, batch)
+                count += len(batch)
+            if file_hash is not None:
+                self.record_manifest(conn, table_name, file, file_hash, count, first_rowid)
+            conn.commit()
+            logging.info('%s: File Loaded successfully!!' % file)
+            return count
+        except Exception as e:
+            conn.rollback()
+            logging.info('Exception raised while Bulk Inserting Data into Table')
+            shutil.move(self.data_path+'/' + file, self.data_path+'_rejects')
+            raise CustomException(e,sys)
+
+    def insert_data_bulk(self,database_name,table_name,file_hashes=None):
+        """
+        * method: insert_data_bulk
+        * description: method to insert data into table with parameterized batched inserts,
+        *              committing once per file. A failing file is rolled back and moved to the rejects
+        * return: none
+        *
+        *
+        * Parameters
+        *   database_name:
+        *   table_name:
+        *   file_hashes: content hash per file to record in the manifest, optional
+        """
+        conn = self.database_connection(database_name)
+        logging.info('Start of Bulk Inserting Data into Table...')
+        for file in listdir(self.data_path):
+            with open(self.data_path+'/'+file, "r") as f:
+                next(f)
+                self.insert_rows(conn, table_name, file, csv.reader(f, delimiter=","),
+                                 file_hashes.get(file) if file_hashes else None)
+        logging.info('End of Bulk Inserting Data into Table...')
+
     def export_csv(self,database_name,table_name):
         """
         * method: export_csv
@@ -165,18 +420,187 @@ class DatabaseOperation:
             sqlSelect = "SELECT *  FROM "+table_name+""
             cursor = conn.cursor()
             cursor.execute(sqlSelect)
-            results = cursor.fetchall()
             # Get the headers of the csv file
             headers = [i[0] for i in cursor.description]
             #Make the CSV ouput directory
             if not os.path.isdir(self.file_from_db):
                 os.makedirs(self.file_from_db)
             # Open CSV file for writing.
-            csv_file = csv.writer(open(self.file_from_db + self.file_name, 'w', newline=''),delimiter=',', lineterminator='\r\n',quoting=csv.QUOTE_ALL, escapechar='\\')
-            # Add the headers and data to the CSV file.
-            csv_file.writerow(headers)
-            csv_file.writerows(results)
+            with open(self.file_from_db + self.file_name, 'w', newline='') as f:
+                csv_file = csv.writer(f,delimiter=',', lineterminator='\r\n',quoting=csv.QUOTE_ALL, escapechar='\\')
+                # Add the headers and data to the CSV file, reading the table in chunks to keep the memory flat.
+                csv_file.writerow(headers)
+                while True:
+                    results = cursor.fetchmany(self.ingestion_config.export_chunk_size)
+                    if not results:
+                        break
+                    csv_file.writerows(results)
             logging.info('End of Exporting Data into CSV...')
         except Exception as e:
             logging.info('Exception raised while Exporting Data into CSV')
+            raise CustomException(e,sys)
+
+    def iter_chunks(self,database_name,table_name,chunk_size=None):
+        """
+        * method: iter_chunks
+        * description: generator to read the table in chunks of chunk_size rows, so that the next stages
+        *              can use the data without exporting it to a file
+        * return: yields the column names and a list of rows per chunk
+        *
+        *
+        * Parameters
+        *   database_name:
+        *   table_name:
+        *   chunk_size: rows per chunk, defaults to the export chunk size of the config
+        """
+        chunk_size = chunk_size or self.ingestion_config.export_chunk_size
+        cursor = self.database_connection(database_name).cursor()
+        try:
+            cursor.execute("SELECT * FROM "+table_name+" ORDER BY rowid")
+            headers = [i[0] for i in cursor.description]
+            while True:
+                results = cursor.fetchmany(chunk_size)
+                if not results:
+                    break
+                yield headers, results
+        except Exception as e:
+            logging.info('Exception raised while Reading Data in Chunks')
+            raise CustomException(e,sys)
+        finally:
+            cursor.close()
+
+    def export_csv_incremental(self,database_name,table_name):
+        """
+        * method: export_csv_incremental
+        * description: method to append the rows inserted since the last export to the csv file.
+        *              The csv file is rebuilt when there is no previous export or rows were replaced
+        * return: none
+        *
+        *
+        * Parameters
+        *   database_name:
+        *   table_name:
+        """
+        self.file_from_db = self.data_path+str('_validation/')
+        self.file_name = 'InputFile.csv'
+        export_file = self.file_from_db + self.file_name
+        try:
+            logging.info('Start of Incremental Exporting Data into CSV...')
+            conn = self.database_connection(database_name)
+            state = conn.execute("SELECT last_rowid FROM export_state_t WHERE table_name = ? AND export_file = ?",
+                                 (table_name, export_file)).fetchone()
+            last_rowid = state[0] if state is not None and os.path.isfile(export_file) else None
+            cursor = conn.execute("SELECT rowid, * FROM "+table_name+" WHERE rowid > ? ORDER BY rowid", (last_rowid or 0,))
+            headers = [i[0] for i in cursor.description][1:]
+            if not os.path.isdir(self.file_from_db):
+                os.makedirs(self.file_from_db)
+            with open(export_file, 'w' if last_rowid is None else 'a', newline='') as f:
+                csv_file = csv.writer(f,delimiter=',', lineterminator='\r\n',quoting=csv.QUOTE_ALL, escapechar='\\')
+                if last_rowid is None:
+                    csv_file.writerow(headers)
+                    last_rowid = 0
+                while True:
+                    results = cursor.fetchmany(self.ingestion_config.export_chunk_size)
+                    if not results:
+                        break
+                    csv_file.writerows(row[1:] for row in results)
+                    last_rowid = results[-1][0]
+            conn.execute("INSERT OR REPLACE INTO export_state_t values (?,?,?)", (table_name, export_file, last_rowid))
+            conn.commit()
+            logging.info('End of Incremental Exporting Data into CSV...')
+        except Exception as e:
+            logging.info('Exception raised while Incremental Exporting Data into CSV')
+            raise CustomException(e,sys)
+
+    def export_columnar(self,database_name,table_name,schema,compact=False):
+        """
+        * method: export_columnar
+        * description: method to export the table into one memory-mappable numpy file per column, typed by
+        *              the dtypes of the compiled schema so that it reads into the same dtypes as the csv export:
+        *              the categorical columns as codes of the schema categories, the integer columns in their
+        *              dtype with a mask file of the missing values, the floats in their dtype and the other
+        *              VARCHAR columns as fixed width unicode with missing values as empty strings. In compact
+        *              mode the integer columns take the smallest integer type of their range and the floats
+        *              are float32
+        * return: none
+        *
+        *
+        * Parameters
+        *   database_name:
+        *   table_name:
+        *   schema: compiled DataSchema of the table
+        *   compact:
+        """
+        column_names = schema.column_names
+        self.file_from_db = self.data_path+str('_validation/')
+        export_dir = self.file_from_db + 'InputFile.columns/'
+        try:
+            logging.info('Start of Exporting Data into Columnar Files...')
+            conn = self.database_connection(database_name)
+            # missing values (NULL or the "NULL" sentinel) are selected as SQL NULLs
+            selects = []
+            for key in column_names.keys():
+                if column_names[key] in ('INTEGER', 'FLOAT'):
+                    selects.append("CASE WHEN typeof({0}) IN ('integer', 'real') THEN {0} END".format(key))
+                else:
+                    selects.append("NULLIF({0}, 'NULL')".format(key))
+            stats = conn.execute("SELECT COUNT(*)" + ''.join(", COUNT({0}), MAX(LENGTH({0})), MIN({0}), MAX({0})".format(select)
+                                                             for select in selects) + " FROM " + table_name).fetchone()
+            rows = stats[0]
+            columns = []
+            for i, key in enumerate(column_names.keys()):
+                non_null, width, minimum, maximum = stats[1 + 4 * i:5 + 4 * i]
+                schema_dtype = schema.dtypes[key]
+                column = {'name': key, 'file': key + '.npy'}
+                if isinstance(schema_dtype, pd.CategoricalDtype):
+                    categories = schema_dtype.categories
+                    column['dtype'] = next(t for t in ['int8', 'int16', 'int32'] if len(categories) <= np.iinfo(t).max)
+                    column['categories'] = categories.tolist()
+                elif pd.api.types.is_integer_dtype(schema_dtype):
+                    dtype = np.dtype(getattr(schema_dtype, 'numpy_dtype', schema_dtype))
+                    if compact and non_null:
+                        dtype = next(np.dtype(t) for t in ['int8', 'int16', 'int32', 'int64']
+                                     if np.iinfo(t).min <= minimum and maximum <= np.iinfo(t).max)
+                    column['dtype'] = dtype.name
+                    # the nullable integer dtypes are read back as nullable, the missing values are masked
+                    column['nullable'] = pd.api.types.is_extension_array_dtype(schema_dtype) or non_null < rows
+                    if non_null < rows:
+                        column['mask'] = key + '.mask.npy'
+                elif pd.api.types.is_float_dtype(schema_dtype):
+                    column['dtype'] = 'float32' if compact else np.dtype(schema_dtype).name
+                else:
+                    column['dtype'] = 'U%d' % max(width or 0, 1)
+                columns.append(column)
+            # rebuild the export, meta.json is written last so that readers only see complete exports
+            if os.path.isdir(export_dir):
+                shutil.rmtree(export_dir)
+            os.makedirs(export_dir)
+            arrays = [np.lib.format.open_memmap(export_dir + column['file'], mode='w+', dtype=column['dtype'], shape=(rows,))
+                      for column in columns]
+            masks = [np.lib.format.open_memmap(export_dir + column['mask'], mode='w+', dtype='bool', shape=(rows,))
+                     if 'mask' in column else None for column in columns]
+            cursor = conn.execute("SELECT " + ', '.join(selects) + " FROM " + table_name + " ORDER BY rowid")
+            offset = 0
+            while True:
+                results = cursor.fetchmany(self.ingestion_config.export_chunk_size)
+                if not results:
+                    break
+                for column, array, mask, values in zip(columns, arrays, masks, zip(*results)):
+                    if 'categories' in column:
+                        values = pd.Categorical(values, categories=column['categories']).codes
+                    elif mask is not None:
+                        mask[offset:offset + len(results)] = [value is None for value in values]
+                        values = [0 if value is None else value for value in values]
+                    elif array.dtype.kind == 'U':
+                        values = ['' if value is None else value for value in values]
+                    array[offset:offset + len(results)] = values
+                offset += len(results)
+            for array in arrays + [mask for mask in masks if mask is not None]:
+                array.flush()
+            del arrays, masks
+            with open(export_dir + 'meta.json', 'w') as f:
+                json.dump({'rows': rows, 'columns': columns}, f)
+            logging.info('End of Exporting Data into Columnar Files...')
+        except Exception as e:
+            logging.info('Exception raised while Exporting Data into Columnar Files')
             raise CustomException(e,sys)
\ No newline at end of file
@@ -0,0 +1,182 @@
+import sys
+import numpy as np
+import pandas as pd
+from src.logger import logging
+from src.exception import CustomException
+
+
+class FeatureEncoder:
+    """
+    *****************************************************************************
+    *
+    * filename:       feature_encoder.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to learn the category vocabulary and the feature layout at training time and
+    *                 build the feature matrix of any batch with index lookups. The layout matches the
+    *                 dummy encoding with drop_first: numeric columns first, then one column per category
+    *                 except the first of each categorical column
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self):
+        self.numeric_columns = []
+        self.categories = {}
+        self.columns = []
+        self.integer_dtypes = {}
+        self.lookup = None
+
+    def fit(self,data):
+        """
+        * method: fit
+        * description: method to learn the numeric columns, the categories and the output column layout
+        * return: the fitted encoder
+        *
+        *
+        * Parameters
+        *   data:
+        """
+        try:
+            logging.info('Start of fitting feature encoder...')
+            self.numeric_columns = []
+            self.categories = {}
+            self.integer_dtypes = {}
+            for column in data.columns:
+                if isinstance(data[column].dtype, pd.CategoricalDtype):
+                    self.categories[column] = sorted(data[column].cat.categories)
+                elif not pd.api.types.is_numeric_dtype(data[column].dtype):
+                    self.categories[column] = sorted(data[column].dropna().unique())
+                else:
+                    self.numeric_columns.append(column)
+                    if pd.api.types.is_integer_dtype(data[column].dtype) and not data[column].hasnans:
+                        # integer dtype of the column, kept by transform_frame in narrow mode
+                        self.integer_dtypes[column] = str(np.dtype(getattr(data[column].dtype, 'numpy_dtype', data[column].dtype)))
+            self.columns = list(self.numeric_columns)
+            for column, categories in self.categories.items():
+                self.columns += [column + '_' + str(category) for category in categories[1:]]
+            self.lookup = None
+            logging.info('Feature layout: ' + str(self.columns))
+            logging.info('End of fitting feature encoder...')
+            return self
+        except Exception as e:
+            logging.info('Exception raised while fitting feature encoder')
+            raise CustomException(e,sys)
+
+    def transform(self,data,dtype='float64'):
+        """
+        * method: transform
+        * description: method to build the feature matrix in one preallocated array. Unknown or missing
+        *              categories are encoded as zeros, missing numeric values are kept as NaN
+        * return: numpy array with the fitted column layout
+        *
+        *
+        * Parameters
+        *   data:
+        *   dtype: float dtype of the feature matrix, float32 in compact mode
+        """
+        try:
+            features = np.zeros((len(data), len(self.columns)), dtype=dtype)
+            for position, column in enumerate(self.numeric_columns):
+                features[:, position] = data[column].astype(dtype).to_numpy()
+            offset = len(self.numeric_columns)
+            rows = np.arange(len(data))
+            for column, categories in self.categories.items():
+                codes = pd.Categorical(data[column], categories=categories).codes
+                encoded = codes > 0
+                features[rows[encoded], offset + codes[encoded] - 1] = 1
+                offset += len(categories) - 1
+            return features
+        except Exception as e:
+            logging.info('Exception raised while transforming features')
+            raise CustomException(e,sys)
+
+    def transform_frame(self,data,dtype='float64',narrow=False):
+        """
+        * method: transform_frame
+        * description: method to build the feature matrix as a pandas DataFrame. With narrow, the one-hot
+        *              columns are int8 and the columns that were integers without missing values at fit
+        *              time keep their fitted integer dtype, unless the batch has missing values or values out
+        *              of its range; the other numeric columns are given the float dtype
+        * return: A pandas DataFrame with the fitted column layout
+        *
+        *
+        * Parameters
+        *   data:
+        *   dtype:
+        *   narrow: keep the narrow dtypes of compact mode
+        """
+        if not narrow:
+            return pd.DataFrame(self.transform(data, dtype), columns=self.columns, index=data.index)
+        try:
+            columns = {}
+            integer_dtypes = getattr(self, 'integer_dtypes', {})
+            for column in self.numeric_columns:
+                values = data[column]
+                integer_dtype = integer_dtypes.get(column)
+                if (integer_dtype is not None and pd.api.types.is_integer_dtype(values.dtype) and not values.hasnans
+                        and (len(values) == 0 or np.iinfo(integer_dtype).min <= values.min() <= values.max() <= np.iinfo(integer_dtype).max)):
+                    columns[column] = values.to_numpy(dtype=integer_dtype)
+                else:
+                    columns[column] = values.astype(dtype).to_numpy()
+            for column, categories in self.categories.items():
+                codes = pd.Categorical(data[column], categories=categories).codes
+                for code, category in enumerate(categories[1:], 1):
+                    columns[column + '_' + str(category)] = (codes == code).astype('int8')
+            return pd.DataFrame(columns, index=data.index)
+        except Exception as e:
+            logging.info('Exception raised while transforming features')
+            raise CustomException(e,sys)
+
+    def compile_lookup(self):
+        """
+        * method: compile_lookup
+        * description: method to compile the fitted layout into plain dictionaries for the record path
+        * return: tuple of the numeric positions and the one-hot position of each category
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        numeric = [(column, position) for position, column in enumerate(self.numeric_columns)]
+        categorical = []
+        offset = len(self.numeric_columns)
+        for column, categories in self.categories.items():
+            categorical.append((column, {str(category): offset + code - 1 for code, category in enumerate(categories) if code > 0}))
+            offset += len(categories) - 1
+        self.lookup = (numeric, categorical)
+        return self.lookup
+
+    def transform_records(self,records):
+        """
+        * method: transform_records
+        * description: method to build the feature matrix of a few records given as dictionaries, without
+        *              pandas. Unknown or missing categories are encoded as zeros, missing numeric values as NaN
+        * return: numpy array with the fitted column layout
+        *
+        *
+        * Parameters
+        *   records: a dictionary or a list of dictionaries of column values
+        """
+        if isinstance(records, dict):
+            records = [records]
+        numeric, categorical = getattr(self, 'lookup', None) or self.compile_lookup()
+        width = len(self.columns)
+        rows = []
+        for record in records:
+            row = [0.0] * width
+            for column, position in numeric:
+                value = record.get(column)
+                row[position] = float('nan') if value is None or value == '' else float(value)
+            for column, positions in categorical:
+                position = positions.get(str(record.get(column)))
+                if position is not None:
+                    row[position] = 1.0
+            rows.append(row)
+        return np.array(rows, dtype='float64').reshape(len(rows), width)
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import pickle
+from dataclasses import dataclass
+from sklearn.model_selection import train_test_split
+from src.components.data_ingestion import LoadValidate
+from src.components.data_transformation import Preprocessor
+from src.components.data_schema import load_schema
+from src.components.model_tuner import ModelTuner
+from src.utils import FileOperation
+from src.logger import logging
+from src.exception import CustomException
+
+@dataclass
+class ModelTrainerConfig:
+    pipeline_path: str=os.path.join('artifacts','pipeline')
+    label_name: str='left'
+    test_size: float=0.25
+    random_state: int=42
+
+class ModelTrainer:
+    """
+    *****************************************************************************
+    *
+    * filename:       model_trainer.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for the stages of training: ingestion, validation, preprocessing, tuning of each
+    *                 model family and saving of the best model. Each stage reads the outputs of the stages
+    *                 before it from the pipeline directory and writes its own there
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,run_id,data_path,mode):
+        self.run_id = run_id
+        self.data_path = data_path
+        self.mode = mode
+        self.loadValidate = LoadValidate(self.run_id, self.data_path, mode)
+        self.preprocessor = Preprocessor(self.run_id, self.data_path, mode)
+        # one compact_dtypes setting for the columnar export and the preprocessing
+        self.loadValidate.transformation_config = self.preprocessor.transformation_config
+        self.tuner = ModelTuner(self.run_id, self.data_path, mode)
+        self.fileOperation = FileOperation(self.run_id, self.data_path, mode)
+        self.trainer_config = ModelTrainerConfig()
+
+    def stage_file(self,name):
+        """
+        * method: stage_file
+        * description: method to get the file of a stage output in the pipeline directory
+        * return: path of the file
+        *
+        *
+        * Parameters
+        *   name:
+        """
+        return os.path.join(self.trainer_config.pipeline_path, name)
+
+    def save_stage_output(self,output,name):
+        """
+        * method: save_stage_output
+        * description: method to save a stage output, written to a temporary file first so that a stage that
+        *              fails halfway leaves the previous output in place
+        * return: none
+        *
+        *
+        * Parameters
+        *   output:
+        *   name:
+        """
+        os.makedirs(self.trainer_config.pipeline_path, exist_ok=True)
+        path = self.stage_file(name)
+        with open(path + '.part', 'wb') as f:
+            if name.endswith('.json'):
+                f.write(json.dumps(output, indent=2).encode())
+            else:
+                pickle.dump(output, f)
+        os.replace(path + '.part', path)
+
+    def load_stage_output(self,name):
+        """
+        * method: load_stage_output
+        * description: method to load a stage output
+        * return: the stage output
+        *
+        *
+        * Parameters
+        *   name:
+        """
+        with open(self.stage_file(name), 'rb') as f:
+            return json.load(f) if name.endswith('.json') else pickle.load(f)
+
+    def ingest(self):
+        """
+        * method: ingest
+        * description: method to load the new training files into the database, export the validated set
+        *              and profile it once for the later stages
+        * return: none
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        self.loadValidate.validate_trainset()
+        self.preprocessor.raw_profile('train_raw')
+
+    def validated_data(self):
+        """
+        * method: validated_data
+        * description: method to get the validated set exported by the ingestion
+        * return: list with the path of the columnar export or the csv export
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        return [self.preprocessor.input_source()[1]]
+
+    def validate(self):
+        """
+        * method: validate
+        * description: method to check from the profile of the validated set that it has rows, the schema
+        *              columns and both labels
+        * return: none
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        try:
+            logging.info('Start of validating training set...')
+            profile = self.preprocessor.raw_profile('train_raw')
+            columns = profile['columns']
+            missing = [column for column in load_schema('schema_train').column_names if column not in columns]
+            if missing:
+                raise ValueError('Columns missing from the training set: ' + str(missing))
+            label = columns[self.trainer_config.label_name]
+            if 'frequencies' in label:
+                both_labels = len(label['frequencies']) > 1
+            else:
+                both_labels = label['count'] > 0 and label['min'] < label['max']
+            if not both_labels:
+                raise ValueError('The training set needs rows of both labels, found %d rows' % profile['rows'])
+            # the stage output holds the statistics only, so that an identical re-export leaves it unchanged
+            self.save_stage_output({key: value for key, value in profile.items() if key != 'source'}, 'validation.json')
+            logging.info('End of validating training set...')
+        except Exception as e:
+            logging.info('Exception raised while validating training set')
+            raise CustomException(e,sys)
+
+    def preprocess(self):
+        """
+        * method: preprocess
+        * description: method to preprocess the training set and split it into train and test sets
+        * return: none
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        try:
+            X, y = self.preprocessor.preprocess_trainset()
+            config = self.trainer_config
+            train_x, test_x, train_y, test_y = train_test_split(X, y, test_size=config.test_size, stratify=y,
+                                                                random_state=config.random_state)
+            self.save_stage_output({'train_x': train_x, 'test_x': test_x, 'train_y': train_y, 'test_y': test_y,
+                                    'encoder': self.preprocessor.encoder, 'imputer': self.preprocessor.imputer},
+                                   'preprocessed.pkl')
+        except Exception as e:
+            logging.info('Exception raised while preprocessing training set')
+            raise CustomException(e,sys)
+
+    def tune(self,model_name):
+        """
+        * method: tune
+        * description: method to tune one model family on the train set and score it on the test set. The
+        *              two families are tuned at the same time, each with its share of the workers
+        * return: none
+        *
+        *
+        * Parameters
+        *   model_name: XGBoost or RandomForest
+        """
+        try:
+            data = self.load_stage_output('preprocessed.pkl')
+            xgboost_jobs, random_forest_jobs = self.tuner.family_jobs()
+            if model_name == 'XGBoost':
+                model = self.tuner.family_tuner(xgboost_jobs).best_params_xgboost(data['train_x'], data['train_y'])
+            else:
+                model = self.tuner.family_tuner(random_forest_jobs).best_params_randomforest(data['train_x'], data['train_y'])
+            score = self.tuner.score_model(model_name, model, data['test_x'], data['test_y'])
+            self.save_stage_output({'model': model, 'score': score}, model_name + '.pkl')
+        except Exception as e:
+            logging.info('Exception raised while tuning ' + model_name)
+            raise CustomException(e,sys)
+
+    def save_best_model(self):
+        """
+        * method: save_best_model
+        * description: method to save the best scoring model with the encoder and the imputer it was trained with
+        * return: none
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        try:
+            xgboost = self.load_stage_output('XGBoost.pkl')
+            random_forest = self.load_stage_output('RandomForest.pkl')
+            model_name, best = ('XGBoost', xgboost) if random_forest['score'] < xgboost['score'] else ('RandomForest', random_forest)
+            data = self.load_stage_output('preprocessed.pkl')
+            self.fileOperation.save_model(best['model'], model_name)
+            self.fileOperation.save_artifact(data['encoder'], model_name, 'encoder')
+            self.fileOperation.save_artifact(data['imputer'], model_name, 'imputer')
+            self.save_stage_output({'model': model_name, 'score': best['score'], 'run_id': self.run_id}, 'best_model.json')
+            logging.info('Best model: %s, score %s' % (model_name, best['score']))
+        except Exception as e:
+            logging.info('Exception raised while saving best model')
+            raise CustomException(e,sys)
@@ -1,12 +1,50 @@
-from sklearn.model_selection import GridSearchCV
+from sklearn.experimental import enable_halving_search_cv  # enables HalvingGridSearchCV
+from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, HalvingGridSearchCV
 from sklearn.ensemble import RandomForestClassifier
 from xgboost import XGBClassifier
+from src.components.staged_search import StagedSearchCV, EarlyStoppingSearchCV
+from src.components.tuning_store import TuningStore, CheckpointedSearchCV
+from src.components.binned_search import BinnedSearchCV
+from src.components.tuning_queue import TuningQueueConfig, QueueSearchCV
 from sklearn.metrics  import roc_auc_score,accuracy_score
 from sklearn.metrics import r2_score
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from src.logger import logging
 from src.exception import CustomException
+import os
 import sys
 
+@dataclass
+class ModelTunerConfig:
+    # worker processes fitting the grid candidates, -1 for the cores left over by the inner threads
+    n_jobs: int=1
+    # threads of each model fit, outer workers times inner threads should not exceed the cores
+    inner_threads: int=1
+    # tune XGBoost and Random Forest at the same time, each with half of the workers
+    parallel_families: bool=False
+    # grid: every candidate, random: n_iter sampled candidates, halving: successive halving of the candidates,
+    # staged: every candidate, the smaller ensembles scored as prefixes of the largest of each configuration,
+    # binned: staged, with XGBoost trained on training data binned once per fold and shared by the workers,
+    # queue: every candidate, fitted by worker processes leasing the fits from a durable job queue
+    search_strategy: str='grid'
+    n_iter: int=10
+    # resource given to the candidates kept at each halving round: n_samples or n_estimators
+    halving_resource: str='n_samples'
+    halving_factor: int=3
+    random_state: int=42
+    # XGBoost rounds without validation AUC improvement before a fit stops, 0 to search n_estimators as a grid axis
+    early_stopping_rounds: int=0
+    # part of the training rows of each fold held out to decide when to stop
+    validation_fraction: float=0.2
+    # SQLite file keeping every fold score of the grid search to resume it, e.g. artifacts/tuning/tuning_scores.db,
+    # None for a plain grid search
+    checkpoint_path: str=None
+    # SQLite job queue of the queue strategy, shared with the workers started by python -m src.components.tuning_queue
+    queue_path: str=os.path.join('artifacts','tuning','queue','tuning_queue.db')
+    # local worker processes started by each queued search, -1 for n_jobs, 0 to rely on workers started separately
+    queue_workers: int=-1
+
 class ModelTuner:
     """
     *****************************************************************************
@@ -27,8 +65,98 @@ class ModelTuner:
     def __init__(self,run_id,data_path,mode):
         self.run_id = run_id
         self.data_path = data_path
+        self.mode = mode
         self.rfc = RandomForestClassifier()
         self.xgb = XGBClassifier(objective='binary:logistic')
+        self.tuner_config = ModelTunerConfig()
+        self.fits = 0
+
+    def outer_jobs(self):
+        """
+        * method: outer_jobs
+        * description: method to get the number of worker processes of the grid search, so that the workers
+        *              and their inner threads do not oversubscribe the cores
+        * return: number of workers
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        config = self.tuner_config
+        if config.n_jobs < 0:
+            return max(1, (os.cpu_count() or 1) // config.inner_threads)
+        return max(1, config.n_jobs)
+
+    def search(self,estimator,param_grid):
+        """
+        * method: search
+        * description: method to build the hyper parameter search of the configured strategy
+        * return: GridSearchCV, RandomizedSearchCV, HalvingGridSearchCV, StagedSearchCV, BinnedSearchCV,
+        *         QueueSearchCV or CheckpointedSearchCV
+        *
+        *
+        * Parameters
+        *   estimator:
+        *   param_grid:
+        """
+        config = self.tuner_config
+        if config.search_strategy == 'random':
+            return RandomizedSearchCV(estimator, param_grid, n_iter=config.n_iter, cv=5, n_jobs=self.outer_jobs(),
+                                      random_state=config.random_state)
+        if config.search_strategy == 'halving':
+            if config.halving_resource == 'n_estimators':
+                # the candidates are compared on few trees first, n_estimators is the resource instead of an axis
+                n_estimators = param_grid['n_estimators']
+                param_grid = {key: value for key, value in param_grid.items() if key != 'n_estimators'}
+                return HalvingGridSearchCV(estimator, param_grid, factor=config.halving_factor, resource='n_estimators',
+                                           min_resources=min(n_estimators), max_resources=max(n_estimators), cv=5,
+                                           n_jobs=self.outer_jobs(), random_state=config.random_state)
+            return HalvingGridSearchCV(estimator, param_grid, factor=config.halving_factor, cv=5,
+                                       n_jobs=self.outer_jobs(), random_state=config.random_state)
+        if config.search_strategy == 'binned' and isinstance(estimator, XGBClassifier):
+            return BinnedSearchCV(estimator, param_grid, cv=5, n_jobs=self.outer_jobs())
+        if config.search_strategy in ('staged', 'binned'):
+            return StagedSearchCV(estimator, param_grid, cv=5, n_jobs=self.outer_jobs())
+        if config.search_strategy == 'queue':
+            n_workers = self.outer_jobs() if config.queue_workers < 0 else config.queue_workers
+            return QueueSearchCV(estimator, param_grid, cv=5, n_workers=n_workers,
+                                 config=TuningQueueConfig(queue_path=config.queue_path))
+        if config.search_strategy != 'grid':
+            raise ValueError('Unknown search strategy: ' + config.search_strategy)
+        if config.checkpoint_path:
+            return CheckpointedSearchCV(estimator, param_grid, TuningStore(config.checkpoint_path), cv=5,
+                                        n_jobs=self.outer_jobs())
+        return GridSearchCV(estimator, param_grid, cv=5, n_jobs=self.outer_jobs())
+
+    def family_jobs(self):
+        """
+        * method: family_jobs
+        * description: method to split the workers between the two model families tuned at the same time,
+        *              the XGBoost grid has twice the candidates of the Random Forest grid
+        * return: tuple of the XGBoost and the Random Forest workers
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        n_jobs = self.outer_jobs()
+        xgboost_jobs = max(1, n_jobs * 2 // 3)
+        return xgboost_jobs, max(1, n_jobs - xgboost_jobs)
+
+    def family_tuner(self,n_jobs):
+        """
+        * method: family_tuner
+        * description: method to get a tuner of its own for one model family, to tune both families at the
+        *              same time without sharing the grid attributes
+        * return: ModelTuner
+        *
+        *
+        * Parameters
+        *   n_jobs: worker processes of the family
+        """
+        tuner = ModelTuner(self.run_id, self.data_path, self.mode)
+        tuner.tuner_config = replace(self.tuner_config, n_jobs=n_jobs, parallel_families=False)
+        return tuner
 
     def best_params_randomforest(self,train_x,train_y):
         """
@@ -49,9 +177,10 @@ class ModelTuner:
                                "max_depth": range(2, 4, 1), "max_features": ['auto', 'log2']}
 
             #Creating an object of the Grid Search class
-            self.grid = GridSearchCV(estimator=self.rfc, param_grid=self.param_grid, cv=5)
+            self.grid = self.search(RandomForestClassifier(n_jobs=self.tuner_config.inner_threads), self.param_grid)
             #finding the best parameters
             self.grid.fit(train_x, train_y)
+            self.fits += getattr(self.grid, 'n_fits_', len(self.grid.cv_results_['params']) * self.grid.n_splits_)
 
             #extracting the best parameters
             self.criterion = self.grid.best_params_['criterion']
@@ -59,11 +188,8 @@ class ModelTuner:
             self.max_features = self.grid.best_params_['max_features']
             self.n_estimators = self.grid.best_params_['n_estimators']
 
-            #creating a new model with the best parameters
-            self.rfc = RandomForestClassifier(n_estimators=self.n_estimators, criterion=self.criterion,
-                                              max_depth=self.max_depth, max_features=self.max_features)
-            # training the mew model
-            self.rfc.fit(train_x, train_y)
+            # the search has already refit the model with the best parameters on the whole training set
+            self.rfc = self.grid.best_estimator_
             logging.info('Random Forest best params: '+str(self.grid.best_params_))
             logging.info('End of finding best params for randomforest algo...')
 
@@ -94,19 +220,27 @@ class ModelTuner:
 
             }
             # Creating an object of the Grid Search class
-            self.grid= GridSearchCV(XGBClassifier(objective='binary:logistic'),self.param_grid_xgboost, cv=5)
+            estimator = XGBClassifier(objective='binary:logistic', n_jobs=self.tuner_config.inner_threads)
+            config = self.tuner_config
+            if config.early_stopping_rounds:
+                # n_estimators is only the largest number of trees, each fit stops at its best iteration
+                self.grid = EarlyStoppingSearchCV(estimator, self.param_grid_xgboost, cv=5, n_jobs=self.outer_jobs(),
+                                                  early_stopping_rounds=config.early_stopping_rounds,
+                                                  validation_fraction=config.validation_fraction,
+                                                  random_state=config.random_state)
+            else:
+                self.grid= self.search(estimator, self.param_grid_xgboost)
             # finding the best parameters
             self.grid.fit(train_x, train_y)
+            self.fits += getattr(self.grid, 'n_fits_', len(self.grid.cv_results_['params']) * self.grid.n_splits_)
 
             # extracting the best parameters
             self.learning_rate = self.grid.best_params_['learning_rate']
             self.max_depth = self.grid.best_params_['max_depth']
             self.n_estimators = self.grid.best_params_['n_estimators']
 
-            # creating a new model with the best parameters
-            self.xgb = XGBClassifier(objective='binary:logistic',learning_rate=self.learning_rate, max_depth=self.max_depth, n_estimators=self.n_estimators)
-            # training the mew model
-            self.xgb.fit(train_x, train_y)
+            # the search has already refit the model with the best parameters on the whole training set
+            self.xgb = self.grid.best_estimator_
             logging.info('XGBoost best params: ' + str(self.grid.best_params_))
             logging.info('End of finding best params for XGBoost algo...')
             return self.xgb
@@ -115,6 +249,28 @@ class ModelTuner:
             raise CustomException(e,sys)
 
 
+    def score_model(self,model_name,model,test_x,test_y):
+        """
+        * method: score_model
+        * description: method to score a tuned model on the test set
+        * return: AUC, or accuracy when the test set has only one label
+        *
+        *
+        * Parameters
+        *   model_name:
+        *   model:
+        *   test_x:
+        *   test_y:
+        """
+        prediction = model.predict(test_x)
+        if len(test_y.unique()) == 1:  # if there is only one label in y, then roc_auc_score returns error. We will use accuracy in that case
+            score = accuracy_score(test_y, prediction)
+            logging.info('Accuracy for ' + model_name + ':' + str(score))
+        else:
+            score = roc_auc_score(test_y, prediction)
+            logging.info('AUC for ' + model_name + ':' + str(score))
+        return score
+
     def get_best_model(self,train_x,train_y,test_x,test_y):
         """
         * method: get_best_model
@@ -130,26 +286,21 @@ class ModelTuner:
         """
         try:
             logging.info('Start of finding best model...')
-            self.xgboost= self.best_params_xgboost(train_x,train_y)
-            self.prediction_xgboost = self.xgboost.predict(test_x) # Predictions using the XGBoost Model
-
-            if len(test_y.unique()) == 1:  # if there is only one label in y, then roc_auc_score returns error. We will use accuracy in that case
-                self.xgboost_score = accuracy_score(test_y, self.prediction_xgboost)
-                logging.info('Accuracy for XGBoost:' + str(self.xgboost_score))
+            if self.tuner_config.parallel_families:
+                tuners = [self.family_tuner(n_jobs) for n_jobs in self.family_jobs()]
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    xgboost = executor.submit(tuners[0].best_params_xgboost, train_x, train_y)
+                    random_forest = executor.submit(tuners[1].best_params_randomforest, train_x, train_y)
+                    self.xgboost, self.random_forest = xgboost.result(), random_forest.result()
+                self.fits += sum(tuner.fits for tuner in tuners)
             else:
-                self.xgboost_score = roc_auc_score(test_y, self.prediction_xgboost)  # AUC for XGBoost
-                logging.info('AUC for XGBoost:' + str(self.xgboost_score))
+                self.xgboost= self.best_params_xgboost(train_x,train_y)
+            self.xgboost_score = self.score_model('XGBoost', self.xgboost, test_x, test_y)
 
             # create best model for Random Forest
-            self.random_forest=self.best_params_randomforest(train_x,train_y)
-            self.prediction_random_forest=self.random_forest.predict(test_x) # prediction using the Random Forest Algorithm
-
-            if len(test_y.unique()) == 1:  # if there is only one label in y, then roc_auc_score returns error. We will use accuracy in that case
-                self.random_forest_score = accuracy_score(test_y, self.prediction_random_forest)
-                logging.info('Accuracy for XGBoost:' + str(self.random_forest_score))
-            else:
-                self.random_forest_score = roc_auc_score(test_y, self.prediction_random_forest)  # AUC for XGBoost
-                logging.info('AUC for XGBoost:' + str(self.random_forest_score))
+            if not self.tuner_config.parallel_families:
+                self.random_forest=self.best_params_randomforest(train_x,train_y)
+            self.random_forest_score = self.score_model('RandomForest', self.random_forest, test_x, test_y)
 
             #comparing the two models
             logging.info('End of finding best model...')
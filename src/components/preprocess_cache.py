@@ -0,0 +1,122 @@
+import os
+import sys
+import pickle
+from src.logger import logging
+from src.exception import CustomException
+
+
+class PreprocessCache:
+    """
+    *****************************************************************************
+    *
+    * filename:       preprocess_cache.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to keep the preprocessed training sets on disk, one file per content key.
+    *                 The key is derived from the input data and the preprocessing version, so an entry
+    *                 never needs invalidation; the least recently used entries are evicted when the cache
+    *                 grows over its size limit
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,cache_path,max_bytes):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+
+    def entry_path(self,key):
+        """
+        * method: entry_path
+        * description: method to get the file of a cache entry
+        * return: path of the entry file
+        *
+        *
+        * Parameters
+        *   key:
+        """
+        return os.path.join(self.cache_path, key + '.pkl')
+
+    def get(self,key):
+        """
+        * method: get
+        * description: method to get a cached entry, marking it as recently used. An entry that cannot be
+        *              read, truncated or pickled by an older version of the classes, is removed and
+        *              treated as a miss
+        * return: the cached entry, None on a cache miss
+        *
+        *
+        * Parameters
+        *   key:
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)
+            logging.info('Preprocess cache hit: %s' % key)
+            return entry
+        except FileNotFoundError:
+            logging.info('Preprocess cache miss: %s' % key)
+            return None
+        except Exception as e:
+            logging.info('Preprocess cache entry %s unreadable, removed: %r' % (key, e))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+    def put(self,key,entry):
+        """
+        * method: put
+        * description: method to store an entry, written to a temporary file first so that a reader never
+        *              sees a partial entry, then evict the least recently used entries over the size limit
+        * return: none
+        *
+        *
+        * Parameters
+        *   key:
+        *   entry:
+        """
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            path = self.entry_path(key)
+            with open(path + '.part', 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.part', path)
+            self.evict()
+        except Exception as e:
+            logging.info('Exception raised while writing preprocess cache')
+            raise CustomException(e,sys)
+
+    def evict(self):
+        """
+        * method: evict
+        * description: method to remove the least recently used entries until the cache fits its size limit
+        * return: list of evicted keys
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        entries = []
+        for f in os.listdir(self.cache_path):
+            if f.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.cache_path, f))
+                entries.append((stat.st_mtime, stat.st_size, f))
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, f in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_path, f))
+            total -= size
+            evicted.append(f[:-len('.pkl')])
+            logging.info('Preprocess cache evicted: %s' % f)
+        return evicted
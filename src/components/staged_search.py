@@ -0,0 +1,207 @@
+import sys
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, check_cv, train_test_split
+from xgboost import XGBClassifier
+from src.logger import logging
+from src.exception import CustomException
+
+
+def _fit_stages(estimator,params,stages,stage_param,train_x,train_y,test_x,test_y):
+    """
+    * method: _fit_stages
+    * description: function to fit the largest ensemble of a configuration on one fold and score each of
+    *              the smaller ensembles as a prefix of it: the first trees of the boosting rounds for
+    *              XGBoost, trees added with warm_start for the other ensembles
+    * return: list of accuracy per stage
+    *
+    *
+    * Parameters
+    *   estimator:
+    *   params: configuration without the stage parameter
+    *   stages: sorted stage values
+    *   stage_param:
+    *   train_x, train_y, test_x, test_y: the fold
+    """
+    model = clone(estimator).set_params(**params)
+    scores = []
+    if isinstance(model, XGBClassifier):
+        model.set_params(**{stage_param: stages[-1]}).fit(train_x, train_y)
+        for stage in stages:
+            scores.append(accuracy_score(test_y, model.predict(test_x, iteration_range=(0, stage))))
+    else:
+        model.set_params(warm_start=True)
+        for stage in stages:
+            model.set_params(**{stage_param: stage}).fit(train_x, train_y)
+            scores.append(accuracy_score(test_y, model.predict(test_x)))
+    return scores
+
+
+def _fit_early_stopping(estimator,params,max_rounds,rounds,validation_fraction,random_state,
+                        train_x,train_y,test_x,test_y):
+    """
+    * method: _fit_early_stopping
+    * description: function to fit an XGBoost configuration on one fold, holding out part of the fold
+    *              training rows to stop adding trees once the validation AUC stops improving
+    * return: tuple of the accuracy on the fold test rows and the number of trees up to the best iteration
+    *
+    *
+    * Parameters
+    *   estimator:
+    *   params: configuration without n_estimators
+    *   max_rounds: the largest number of trees
+    *   rounds: rounds without improvement before stopping
+    *   validation_fraction:
+    *   random_state:
+    *   train_x, train_y, test_x, test_y: the fold
+    """
+    fit_x, validation_x, fit_y, validation_y = train_test_split(train_x, train_y, test_size=validation_fraction,
+                                                                stratify=train_y, random_state=random_state)
+    model = clone(estimator).set_params(**params)
+    model.set_params(n_estimators=max_rounds, early_stopping_rounds=rounds, eval_metric='auc')
+    model.fit(fit_x, fit_y, eval_set=[(validation_x, validation_y)], verbose=False)
+    # predict uses the trees up to the best iteration
+    return accuracy_score(test_y, model.predict(test_x)), model.best_iteration + 1
+
+
+class StagedSearchCV:
+    """
+    *****************************************************************************
+    *
+    * filename:       staged_search.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for an exhaustive grid search of tree ensembles that fits the largest ensemble
+    *                 of each configuration once per fold and scores the smaller ones as its prefixes. It
+    *                 scores with accuracy and exposes the results like GridSearchCV
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,estimator,param_grid,cv=5,n_jobs=1,stage_param='n_estimators'):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.stage_param = stage_param
+
+    def fit(self,train_x,train_y):
+        """
+        * method: fit
+        * description: method to score every candidate of the grid and refit the best one on all the data
+        * return: the fitted search
+        *
+        *
+        * Parameters
+        *   train_x:
+        *   train_y:
+        """
+        try:
+            stages = sorted(self.param_grid[self.stage_param])
+            grid = {key: value for key, value in self.param_grid.items() if key != self.stage_param}
+            configurations = list(ParameterGrid(grid))
+            folds = list(check_cv(self.cv, train_y, classifier=True).split(train_x, train_y))
+            self.n_splits_ = len(folds)
+            self.n_fits_ = len(configurations) * len(folds)
+            logging.info('Staged search of %d configurations x %d stages' % (len(configurations), len(stages)))
+            x = np.asarray(train_x)
+            y = np.asarray(train_y)
+            scores = Parallel(n_jobs=self.n_jobs)(
+                delayed(_fit_stages)(self.estimator, params, stages, self.stage_param,
+                                     x[train], y[train], x[test], y[test])
+                for params in configurations for train, test in folds)
+            scores = np.array(scores).reshape(len(configurations), len(folds), len(stages)).mean(axis=1)
+            self.cv_results_ = {'params': [], 'mean_test_score': []}
+            for params, configuration_scores in zip(configurations, scores):
+                for stage, score in zip(stages, configuration_scores):
+                    self.cv_results_['params'].append(dict(params, **{self.stage_param: stage}))
+                    self.cv_results_['mean_test_score'].append(score)
+            self.best_index_ = int(np.argmax(self.cv_results_['mean_test_score']))
+            self.best_params_ = self.cv_results_['params'][self.best_index_]
+            self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(train_x, train_y)
+            return self
+        except Exception as e:
+            logging.info('Exception raised while running staged search')
+            raise CustomException(e,sys)
+
+
+class EarlyStoppingSearchCV:
+    """
+    *****************************************************************************
+    *
+    * filename:       staged_search.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for an exhaustive grid search of XGBoost that replaces the n_estimators axis by
+    *                 early stopping: each configuration is fitted once per fold up to the largest number of
+    *                 trees, stopping on a validation split of the fold. The best configuration is refit on
+    *                 all the data with the mean best iteration of its folds as number of trees
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,estimator,param_grid,cv=5,n_jobs=1,early_stopping_rounds=10,validation_fraction=0.2,random_state=42):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.early_stopping_rounds = early_stopping_rounds
+        self.validation_fraction = validation_fraction
+        self.random_state = random_state
+
+    def fit(self,train_x,train_y):
+        """
+        * method: fit
+        * description: method to score every configuration with early stopping and refit the best one
+        * return: the fitted search
+        *
+        *
+        * Parameters
+        *   train_x:
+        *   train_y:
+        """
+        try:
+            max_rounds = max(self.param_grid['n_estimators'])
+            grid = {key: value for key, value in self.param_grid.items() if key != 'n_estimators'}
+            configurations = list(ParameterGrid(grid))
+            folds = list(check_cv(self.cv, train_y, classifier=True).split(train_x, train_y))
+            self.n_splits_ = len(folds)
+            self.n_fits_ = len(configurations) * len(folds)
+            logging.info('Early stopping search of %d configurations up to %d trees' % (len(configurations), max_rounds))
+            x = np.asarray(train_x)
+            y = np.asarray(train_y)
+            results = Parallel(n_jobs=self.n_jobs)(
+                delayed(_fit_early_stopping)(self.estimator, params, max_rounds, self.early_stopping_rounds,
+                                             self.validation_fraction, self.random_state,
+                                             x[train], y[train], x[test], y[test])
+                for params in configurations for train, test in folds)
+            results = np.array(results).reshape(len(configurations), len(folds), 2).mean(axis=1)
+            self.cv_results_ = {'params': [], 'mean_test_score': []}
+            for params, (score, trees) in zip(configurations, results):
+                self.cv_results_['params'].append(dict(params, n_estimators=int(round(trees))))
+                self.cv_results_['mean_test_score'].append(score)
+            self.best_index_ = int(np.argmax(self.cv_results_['mean_test_score']))
+            self.best_params_ = self.cv_results_['params'][self.best_index_]
+            self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+            self.best_iteration_ = self.best_params_['n_estimators'] - 1
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(train_x, train_y)
+            logging.info('Early stopping best number of trees: %d' % self.best_params_['n_estimators'])
+            return self
+        except Exception as e:
+            logging.info('Exception raised while running early stopping search')
+            raise CustomException(e,sys)
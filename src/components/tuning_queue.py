@@ -0,0 +1,588 @@
+import os
+import sys
+import json
+import time
+import uuid
+import pickle
+import shutil
+import socket
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+import numpy as np
+from dataclasses import dataclass
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, check_cv
+from src.components.tuning_store import data_fingerprint
+from src.logger import logging
+from src.exception import CustomException
+
+@dataclass
+class TuningQueueConfig:
+    queue_path: str=os.path.join('artifacts','tuning','queue','tuning_queue.db')
+    # seconds a worker holds a job without renewing its lease before the job is given to another worker
+    lease_seconds: float=120
+    # attempts of a job before it is marked as failed
+    max_attempts: int=3
+    poll_seconds: float=1.0
+    # seconds a coordinator waits while jobs of its search are pending and no worker is running any
+    worker_timeout: float=600
+    # restarts of the local worker processes of a search that exit before it is finished
+    max_restarts: int=3
+    # keep the shared data and the jobs of a finished search, they are removed by default
+    keep_finished: bool=False
+
+
+class TuningQueue:
+    """
+    *****************************************************************************
+    *
+    * filename:       tuning_queue.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for a durable queue of candidate fits kept in a SQLite file of a shared directory.
+    *                 A worker leases one job at a time and renews the lease while fitting; the jobs of a
+    *                 worker that stopped renewing are given back to the queue, and a job that fails
+    *                 max_attempts times is marked as failed
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,config=None):
+        self.config = config or TuningQueueConfig()
+        self.queue_path = self.config.queue_path
+
+    def connect(self):
+        """
+        * method: connect
+        * description: method to open the queue, creating it on first use. Transactions are started explicitly
+        *              so that leasing a job is atomic between the processes
+        * return: sqlite3 connection
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        os.makedirs(os.path.dirname(self.queue_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.queue_path, timeout=60, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS tuning_jobs_t (job_id INTEGER PRIMARY KEY, search_id TEXT, params TEXT, '
+                     'fold INTEGER, status TEXT, attempts INTEGER DEFAULT 0, worker TEXT, lease_until FLOAT, '
+                     'score FLOAT, error TEXT, updated_at FLOAT, UNIQUE (search_id, params, fold))')
+        conn.execute('CREATE INDEX IF NOT EXISTS tuning_jobs_status_i ON tuning_jobs_t (status, job_id)')
+        return conn
+
+    def search_path(self,search_id):
+        """
+        * method: search_path
+        * description: method to get the directory of the data shared by the jobs of a search
+        * return: path of the directory
+        *
+        *
+        * Parameters
+        *   search_id:
+        """
+        return os.path.join(os.path.dirname(self.queue_path), search_id)
+
+    def enqueue(self,search_id,estimator,candidates,train_x,train_y,n_folds):
+        """
+        * method: enqueue
+        * description: method to share the training set and the estimator of a search and add one job per
+        *              candidate and fold. Jobs already in the queue are kept, so enqueuing a search again resumes it
+        * return: number of jobs added
+        *
+        *
+        * Parameters
+        *   search_id:
+        *   estimator:
+        *   candidates: list of parameter dictionaries
+        *   train_x:
+        *   train_y:
+        *   n_folds:
+        """
+        try:
+            path = self.search_path(search_id)
+            if not os.path.isfile(os.path.join(path, 'search.pkl')):
+                os.makedirs(path, exist_ok=True)
+                np.save(os.path.join(path, 'x.npy'), np.asarray(train_x))
+                np.save(os.path.join(path, 'y.npy'), np.asarray(train_y))
+                with open(os.path.join(path, 'search.pkl.part'), 'wb') as f:
+                    pickle.dump({'estimator': estimator, 'n_folds': n_folds}, f)
+                os.replace(os.path.join(path, 'search.pkl.part'), os.path.join(path, 'search.pkl'))
+            conn = self.connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO tuning_jobs_t (search_id, params, fold, status, updated_at) "
+                                 "VALUES (?, ?, ?, 'pending', ?)",
+                                 [(search_id, json.dumps(params, sort_keys=True), fold, time.time())
+                                  for params in candidates for fold in range(n_folds)])
+                conn.execute('COMMIT')
+                added = conn.total_changes - before
+            finally:
+                conn.close()
+            logging.info('Search %s: %d jobs added to the queue' % (search_id, added))
+            return added
+        except Exception as e:
+            logging.info('Exception raised while enqueuing tuning jobs')
+            raise CustomException(e,sys)
+
+    def lease(self,worker):
+        """
+        * method: lease
+        * description: method to give the oldest pending job to a worker, after putting back the jobs whose
+        *              lease has expired
+        * return: dictionary of the job, None when no job is pending
+        *
+        *
+        * Parameters
+        *   worker:
+        """
+        conn = self.connect()
+        try:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            self.expire_leases(conn)
+            row = conn.execute("SELECT job_id, search_id, params, fold FROM tuning_jobs_t WHERE status = 'pending' "
+                               "ORDER BY job_id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE tuning_jobs_t SET status = 'running', attempts = attempts + 1, worker = ?, "
+                             "lease_until = ?, updated_at = ? WHERE job_id = ?",
+                             (worker, now + self.config.lease_seconds, now, row[0]))
+            conn.execute('COMMIT')
+            if row is None:
+                return None
+            return {'job_id': row[0], 'search_id': row[1], 'params': json.loads(row[2]), 'fold': row[3]}
+        finally:
+            conn.close()
+
+    def expire_leases(self,conn=None):
+        """
+        * method: expire_leases
+        * description: method to put back the running jobs whose lease has expired, their worker having died
+        *              or hung, or mark them as failed after max_attempts
+        * return: number of jobs taken back
+        *
+        *
+        * Parameters
+        *   conn: connection in a transaction, a transaction of its own when not given
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = self.connect()
+            conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            cursor = conn.execute("UPDATE tuning_jobs_t SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                                  "error = 'lease expired', updated_at = ? WHERE status = 'running' AND lease_until < ?",
+                                  (self.config.max_attempts, now, now))
+            if cursor.rowcount:
+                logging.info('%d expired tuning jobs taken back' % cursor.rowcount)
+            if own_conn:
+                conn.execute('COMMIT')
+            return cursor.rowcount
+        finally:
+            if own_conn:
+                conn.close()
+
+    def remove(self,search_id):
+        """
+        * method: remove
+        * description: method to remove the jobs and the shared data of a finished search
+        * return: none
+        *
+        *
+        * Parameters
+        *   search_id:
+        """
+        conn = self.connect()
+        try:
+            conn.execute('DELETE FROM tuning_jobs_t WHERE search_id = ?', (search_id,))
+        finally:
+            conn.close()
+        shutil.rmtree(self.search_path(search_id), ignore_errors=True)
+        logging.info('Search %s removed from the queue' % search_id)
+
+    def renew(self,job_id,worker):
+        """
+        * method: renew
+        * description: method to extend the lease of a job still held by the worker
+        * return: True if the worker still holds the job
+        *
+        *
+        * Parameters
+        *   job_id:
+        *   worker:
+        """
+        conn = self.connect()
+        try:
+            cursor = conn.execute("UPDATE tuning_jobs_t SET lease_until = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+                                  (time.time() + self.config.lease_seconds, job_id, worker))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self,job_id,worker,score):
+        """
+        * method: complete
+        * description: method to record the score of a job. A worker whose lease expired may still complete
+        *              its job, the first score recorded is kept
+        * return: none
+        *
+        *
+        * Parameters
+        *   job_id:
+        *   worker:
+        *   score:
+        """
+        conn = self.connect()
+        try:
+            conn.execute("UPDATE tuning_jobs_t SET status = 'done', score = ?, worker = ?, error = NULL, updated_at = ? "
+                         "WHERE job_id = ? AND status != 'done'", (score, worker, time.time(), job_id))
+        finally:
+            conn.close()
+
+    def fail(self,job_id,worker,error):
+        """
+        * method: fail
+        * description: method to give a failed job back to the queue, or mark it as failed after max_attempts
+        * return: none
+        *
+        *
+        * Parameters
+        *   job_id:
+        *   worker:
+        *   error:
+        """
+        conn = self.connect()
+        try:
+            conn.execute("UPDATE tuning_jobs_t SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                         "error = ?, updated_at = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+                         (self.config.max_attempts, error, time.time(), job_id, worker))
+        finally:
+            conn.close()
+
+    def progress(self,search_id=None):
+        """
+        * method: progress
+        * description: method to count the jobs per status, of one search or of the whole queue
+        * return: dictionary of number of jobs per status
+        *
+        *
+        * Parameters
+        *   search_id:
+        """
+        conn = self.connect()
+        try:
+            if search_id is None:
+                rows = conn.execute('SELECT status, COUNT(*) FROM tuning_jobs_t GROUP BY status').fetchall()
+            else:
+                rows = conn.execute('SELECT status, COUNT(*) FROM tuning_jobs_t WHERE search_id = ? GROUP BY status',
+                                    (search_id,)).fetchall()
+            return dict(rows)
+        finally:
+            conn.close()
+
+    def running_jobs(self):
+        """
+        * method: running_jobs
+        * description: method to list the leased jobs with their worker
+        * return: list of dictionaries of job_id, worker and attempts
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        conn = self.connect()
+        try:
+            rows = conn.execute("SELECT job_id, worker, attempts FROM tuning_jobs_t WHERE status = 'running'").fetchall()
+            return [{'job_id': job_id, 'worker': worker, 'attempts': attempts} for job_id, worker, attempts in rows]
+        finally:
+            conn.close()
+
+    def results(self,search_id):
+        """
+        * method: results
+        * description: method to get the scores of the jobs of a search
+        * return: dictionary of score per (params json, fold), None for the failed jobs
+        *
+        *
+        * Parameters
+        *   search_id:
+        """
+        conn = self.connect()
+        try:
+            rows = conn.execute('SELECT params, fold, score FROM tuning_jobs_t WHERE search_id = ?', (search_id,)).fetchall()
+            return {(params, fold): score for params, fold, score in rows}
+        finally:
+            conn.close()
+
+
+class TuningWorker:
+    """
+    *****************************************************************************
+    *
+    * filename:       tuning_queue.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for a worker process that leases candidate fits from the tuning queue, fits and
+    *                 scores them on their fold with accuracy and records the score, renewing its lease
+    *                 while the fit runs
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,queue,worker_id=None):
+        self.queue = queue
+        self.worker_id = worker_id or '%s-%d-%s' % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self.searches = {}
+
+    def load_search(self,search_id):
+        """
+        * method: load_search
+        * description: method to load the shared data of a search once, memory-mapped, with its folds
+        * return: dictionary of the estimator, the training set and the folds
+        *
+        *
+        * Parameters
+        *   search_id:
+        """
+        if search_id not in self.searches:
+            path = self.queue.search_path(search_id)
+            with open(os.path.join(path, 'search.pkl'), 'rb') as f:
+                search = pickle.load(f)
+            search['x'] = np.load(os.path.join(path, 'x.npy'), mmap_mode='r')
+            search['y'] = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+            search['folds'] = list(check_cv(search['n_folds'], search['y'], classifier=True).split(search['x'], search['y']))
+            self.searches = {search_id: search}
+        return self.searches[search_id]
+
+    def run_job(self,job):
+        """
+        * method: run_job
+        * description: method to fit a candidate on its fold and score it
+        * return: the accuracy
+        *
+        *
+        * Parameters
+        *   job:
+        """
+        search = self.load_search(job['search_id'])
+        train, test = search['folds'][job['fold']]
+        model = clone(search['estimator']).set_params(**job['params'])
+        model.fit(search['x'][train], search['y'][train])
+        return accuracy_score(search['y'][test], model.predict(search['x'][test]))
+
+    def run(self,max_jobs=None,wait_for_jobs=False):
+        """
+        * method: run
+        * description: method to run jobs until the queue has none left, or until max_jobs have been run
+        * return: number of jobs run
+        *
+        *
+        * Parameters
+        *   max_jobs:
+        *   wait_for_jobs: True to keep polling the queue when it is empty
+        """
+        logging.info('Tuning worker %s started' % self.worker_id)
+        count = 0
+        while max_jobs is None or count < max_jobs:
+            job = self.queue.lease(self.worker_id)
+            if job is None:
+                if not wait_for_jobs and not self.queue.progress().get('running'):
+                    break
+                time.sleep(self.queue.config.poll_seconds)
+                continue
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self.heartbeat, args=(job['job_id'], stop), daemon=True)
+            heartbeat.start()
+            try:
+                self.queue.complete(job['job_id'], self.worker_id, self.run_job(job))
+            except Exception as e:
+                logging.info('Tuning job %d failed: %s' % (job['job_id'], e))
+                self.queue.fail(job['job_id'], self.worker_id, repr(e))
+            finally:
+                stop.set()
+                heartbeat.join()
+            count += 1
+        logging.info('Tuning worker %s stopped after %d jobs' % (self.worker_id, count))
+        return count
+
+    def heartbeat(self,job_id,stop):
+        """
+        * method: heartbeat
+        * description: method to renew the lease of the running job until it ends
+        * return: none
+        *
+        *
+        * Parameters
+        *   job_id:
+        *   stop: event set when the job ends
+        """
+        while not stop.wait(self.queue.config.lease_seconds / 3):
+            self.queue.renew(job_id, self.worker_id)
+
+
+def run_worker(config,max_jobs=None,wait_for_jobs=False):
+    """
+    * method: run_worker
+    * description: function to run a tuning worker, used as target of the worker processes
+    * return: number of jobs run
+    *
+    *
+    * Parameters
+    *   config: TuningQueueConfig
+    *   max_jobs:
+    *   wait_for_jobs:
+    """
+    return TuningWorker(TuningQueue(config)).run(max_jobs, wait_for_jobs)
+
+
+class QueueSearchCV:
+    """
+    *****************************************************************************
+    *
+    * filename:       tuning_queue.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for the coordinator of an exhaustive grid search run by the tuning queue. It
+    *                 enqueues one job per candidate and fold, starts local worker processes if asked to,
+    *                 waits for the jobs of the search to finish, whoever runs them, and chooses the best
+    *                 candidate like GridSearchCV. While waiting it takes back the jobs of expired leases,
+    *                 restarts the local workers that died and gives up when no worker runs the pending jobs
+    *                 for worker_timeout seconds. The search id is derived from the estimator, the grid and
+    *                 the data, so a coordinator restarted after a crash resumes the same search; the jobs
+    *                 and the shared data of a finished search are removed unless keep_finished is set
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,estimator,param_grid,cv=5,n_workers=1,config=None):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_workers = n_workers
+        self.queue = TuningQueue(config)
+
+    def fit(self,train_x,train_y):
+        """
+        * method: fit
+        * description: method to run the search through the queue and refit the best candidate on all the data
+        * return: the fitted search
+        *
+        *
+        * Parameters
+        *   train_x:
+        *   train_y:
+        """
+        try:
+            candidates = list(ParameterGrid(self.param_grid))
+            content = json.dumps([type(self.estimator).__name__, self.estimator.get_params(), candidates, self.cv],
+                                 sort_keys=True, default=str)
+            search_id = hashlib.sha256((content + data_fingerprint(train_x, train_y)).encode()).hexdigest()[:16]
+            self.queue.enqueue(search_id, self.estimator, candidates, train_x, train_y, self.cv)
+            self.wait(search_id)
+            results = self.queue.results(search_id)
+            self.n_splits_ = self.cv
+            self.n_fits_ = len(results)
+            self.cv_results_ = {'params': candidates, 'mean_test_score': []}
+            for params in candidates:
+                scores = [results.get((json.dumps(params, sort_keys=True), fold)) for fold in range(self.cv)]
+                # a candidate with a failed fold is not ranked
+                self.cv_results_['mean_test_score'].append(np.nan if None in scores else float(np.mean(scores)))
+            if np.all(np.isnan(self.cv_results_['mean_test_score'])):
+                raise ValueError('Every candidate of search %s failed' % search_id)
+            self.best_index_ = int(np.nanargmax(self.cv_results_['mean_test_score']))
+            self.best_params_ = candidates[self.best_index_]
+            self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(train_x, train_y)
+            if not self.queue.config.keep_finished:
+                self.queue.remove(search_id)
+            return self
+        except Exception as e:
+            logging.info('Exception raised while running queued search')
+            raise CustomException(e,sys)
+
+    def start_worker(self):
+        """
+        * method: start_worker
+        * description: method to start a local worker process. It is spawned rather than forked, the search
+        *              may run in a thread of the training pipeline
+        * return: the started process
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        worker = multiprocessing.get_context('spawn').Process(target=run_worker, args=(self.queue.config,))
+        worker.start()
+        return worker
+
+    def wait(self,search_id):
+        """
+        * method: wait
+        * description: method to wait until every job of the search is done or failed, taking back the jobs
+        *              of expired leases and restarting the local workers that exit before the end
+        * return: none
+        *
+        *
+        * Parameters
+        *   search_id:
+        """
+        config = self.queue.config
+        workers = [self.start_worker() for _ in range(self.n_workers)]
+        restarts = 0
+        busy_at = time.time()
+        try:
+            while True:
+                self.queue.expire_leases()
+                progress = self.queue.progress(search_id)
+                if not progress.get('pending') and not progress.get('running'):
+                    break
+                for i, worker in enumerate(workers):
+                    if not worker.is_alive() and restarts < config.max_restarts:
+                        logging.info('Tuning worker %d exited with code %s, restarting it' % (worker.pid, worker.exitcode))
+                        workers[i] = self.start_worker()
+                        restarts += 1
+                if progress.get('running') or any(worker.is_alive() for worker in workers):
+                    busy_at = time.time()
+                elif time.time() - busy_at > config.worker_timeout:
+                    raise TimeoutError('No worker ran the %d pending jobs of search %s for %d seconds'
+                                       % (progress.get('pending', 0), search_id, config.worker_timeout))
+                logging.info('Search %s progress: %s' % (search_id, progress))
+                time.sleep(config.poll_seconds)
+        except BaseException:
+            for worker in workers:
+                worker.terminate()
+            raise
+        finally:
+            for worker in workers:
+                worker.join()
+
+
+if __name__=="__main__":
+    # python -m src.components.tuning_queue [queue_path] starts a worker that waits for jobs
+    config = TuningQueueConfig()
+    if len(sys.argv) > 1:
+        config.queue_path = sys.argv[1]
+    run_worker(config, wait_for_jobs=True)
@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, check_cv
+from src.logger import logging
+from src.exception import CustomException
+
+
+def data_fingerprint(train_x,train_y):
+    """
+    * method: data_fingerprint
+    * description: function to compute the content hash of a training set, its columns and its labels.
+    *              pandas data and object arrays are hashed by value with hash_pandas_object, so that
+    *              nullable, categorical and object columns give the same digest for the same content
+    * return: sha256 hex digest
+    *
+    *
+    * Parameters
+    *   train_x:
+    *   train_y:
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in getattr(train_x, 'columns', [])]).encode())
+    for values in (train_x, train_y):
+        if not isinstance(values, (pd.DataFrame, pd.Series)):
+            values = np.asarray(values)
+            if values.dtype != object:
+                digest.update(str((values.dtype, values.shape)).encode())
+                digest.update(np.ascontiguousarray(values).tobytes())
+                continue
+            values = pd.DataFrame(values.reshape(len(values), -1))
+        dtypes = [str(dtype) for dtype in values.dtypes] if isinstance(values, pd.DataFrame) else str(values.dtype)
+        digest.update(str((dtypes, values.shape)).encode())
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class TuningStore:
+    """
+    *****************************************************************************
+    *
+    * filename:       tuning_store.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to keep the cross-validation score of every (model, params, fold, data
+    *                 fingerprint) in a SQLite file as soon as the fit finishes, so that an interrupted or
+    *                 repeated search only fits the candidates it has not seen
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,db_path):
+        self.db_path = db_path
+        self.conn = None
+        self.pid = None
+
+    def __getstate__(self):
+        # the connection is opened again by each worker process the store is sent to
+        state = self.__dict__.copy()
+        state['conn'] = None
+        return state
+
+    def connect(self):
+        """
+        * method: connect
+        * description: method to get the connection of this process to the store, opened and initialised
+        *              once. Worker processes open their own connection and wait for each other on the write lock
+        * return: sqlite3 connection
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        if self.conn is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS tuning_scores_t (model TEXT, params TEXT, fold TEXT, fingerprint TEXT, '
+                         'score FLOAT, fit_seconds FLOAT, created_at TEXT, PRIMARY KEY (model, params, fold, fingerprint))')
+            self.conn, self.pid = conn, os.getpid()
+        return self.conn
+
+    def get_scores(self,model,fingerprint):
+        """
+        * method: get_scores
+        * description: method to get the stored scores of a model on a training set
+        * return: dictionary of score per (params, fold)
+        *
+        *
+        * Parameters
+        *   model:
+        *   fingerprint:
+        """
+        rows = self.connect().execute('SELECT params, fold, score FROM tuning_scores_t WHERE model = ? AND fingerprint = ?',
+                                      (model, fingerprint)).fetchall()
+        return {(params, fold): score for params, fold, score in rows}
+
+    def put_score(self,model,params,fold,fingerprint,score,fit_seconds):
+        """
+        * method: put_score
+        * description: method to store the score of one fit
+        * return: none
+        *
+        *
+        * Parameters
+        *   model:
+        *   params: canonical json of the parameters
+        *   fold:
+        *   fingerprint:
+        *   score:
+        *   fit_seconds:
+        """
+        conn = self.connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO tuning_scores_t VALUES (?, ?, ?, ?, ?, ?, datetime('now'))",
+                         (model, params, fold, fingerprint, score, fit_seconds))
+
+
+def _fit_and_store(store,model,key,fingerprint,fold,estimator,params,train_x,train_y,test_x,test_y):
+    """
+    * method: _fit_and_store
+    * description: function to fit a candidate on one fold and store its accuracy right away
+    * return: the accuracy
+    *
+    *
+    * Parameters
+    *   store:
+    *   model:
+    *   key: canonical json of the parameters
+    *   fingerprint:
+    *   fold:
+    *   estimator:
+    *   params:
+    *   train_x, train_y, test_x, test_y: the fold
+    """
+    start = time.perf_counter()
+    score = accuracy_score(test_y, clone(estimator).set_params(**params).fit(train_x, train_y).predict(test_x))
+    store.put_score(model, key, fold, fingerprint, score, time.perf_counter() - start)
+    return score
+
+
+class CheckpointedSearchCV:
+    """
+    *****************************************************************************
+    *
+    * filename:       tuning_store.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for an exhaustive grid search that takes the fold scores already in the tuning
+    *                 store and fits only the missing (params, fold) pairs, storing each as it finishes.
+    *                 It scores with accuracy and exposes the results like GridSearchCV
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,estimator,param_grid,store,cv=5,n_jobs=1):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.store = store
+        self.cv = cv
+        self.n_jobs = n_jobs
+
+    def params_key(self,params):
+        """
+        * method: params_key
+        * description: method to get the canonical json of all the parameters of a candidate, except the
+        *              number of threads which does not change the result
+        * return: json string
+        *
+        *
+        * Parameters
+        *   params:
+        """
+        all_params = clone(self.estimator).set_params(**params).get_params()
+        all_params.pop('n_jobs', None)
+        return json.dumps(all_params, sort_keys=True, default=str)
+
+    def fit(self,train_x,train_y):
+        """
+        * method: fit
+        * description: method to score every candidate of the grid, resuming from the stored scores, and refit
+        *              the best one on all the data
+        * return: the fitted search
+        *
+        *
+        * Parameters
+        *   train_x:
+        *   train_y:
+        """
+        try:
+            model = type(self.estimator).__name__
+            fingerprint = data_fingerprint(train_x, train_y)
+            candidates = list(ParameterGrid(self.param_grid))
+            keys = [self.params_key(params) for params in candidates]
+            folds = list(check_cv(self.cv, train_y, classifier=True).split(train_x, train_y))
+            fold_names = ['%d/%d' % (i, len(folds)) for i in range(len(folds))]
+            scores = self.store.get_scores(model, fingerprint)
+            missing = [(key, params, name, fold) for key, params in zip(keys, candidates)
+                       for name, fold in zip(fold_names, folds) if (key, name) not in scores]
+            self.n_splits_ = len(folds)
+            self.n_fits_ = len(missing)
+            logging.info('%s search: %d of %d fits already stored' % (model, len(candidates) * len(folds) - len(missing),
+                                                                       len(candidates) * len(folds)))
+            x = np.asarray(train_x)
+            y = np.asarray(train_y)
+            results = Parallel(n_jobs=self.n_jobs)(
+                delayed(_fit_and_store)(self.store, model, key, fingerprint, name, self.estimator, params,
+                                        x[train], y[train], x[test], y[test])
+                for key, params, name, (train, test) in missing)
+            for (key, _, name, _), score in zip(missing, results):
+                scores[(key, name)] = score
+            self.cv_results_ = {'params': candidates,
+                                'mean_test_score': [float(np.mean([scores[(key, name)] for name in fold_names])) for key in keys]}
+            self.best_index_ = int(np.argmax(self.cv_results_['mean_test_score']))
+            self.best_params_ = candidates[self.best_index_]
+            self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(train_x, train_y)
+            return self
+        except Exception as e:
+            logging.info('Exception raised while running checkpointed search')
+            raise CustomException(e,sys)
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.components.model_trainer import ModelTrainer
+from src.components.data_schema import SCHEMA_PATH
+from src.utils import Config, get_file_hash
+from src.logger import logging
+from src.exception import CustomException
+
+
+def path_fingerprint(path):
+    """
+    * method: path_fingerprint
+    * description: function to compute the content hash of a file, or of every file under a directory
+    * return: sha256 hex digest, None when the path does not exist
+    *
+    *
+    * Parameters
+    *   path:
+    """
+    if os.path.isfile(path):
+        return get_file_hash(path)
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(get_file_hash(file_path).encode())
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    *****************************************************************************
+    *
+    * filename:       train_pipeline.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class for a stage of the training pipeline: the stages it depends on, the files and
+    *                 settings it reads, the files it writes and the method that runs it. Inputs, outputs
+    *                 and settings can be given as functions when they are known only at run time
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,name,run,deps=(),inputs=(),outputs=(),settings=None):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = inputs
+        self.outputs = outputs
+        self.settings = settings or {}
+
+    def input_paths(self):
+        """
+        * method: input_paths
+        * description: method to get the input files and directories of the stage
+        * return: list of paths
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        return list(self.inputs() if callable(self.inputs) else self.inputs)
+
+    def output_paths(self):
+        """
+        * method: output_paths
+        * description: method to get the output files and directories of the stage
+        * return: list of paths
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        return list(self.outputs() if callable(self.outputs) else self.outputs)
+
+
+class TrainPipeline:
+    """
+    *****************************************************************************
+    *
+    * filename:       train_pipeline.py
+    * version:        1.0
+    * author:         bryanOsmar
+    * creation date:  28-JUN-2024
+    *
+    * change history:
+    *
+    *
+    *
+    * description:    Class to run the training as a graph of stages: ingestion, validation, preprocessing,
+    *                 tuning of each model family and saving. Like make, a stage runs only when the
+    *                 fingerprint of its inputs, settings and dependency outputs, or of its own outputs,
+    *                 differs from the one recorded by its last run. Stages whose dependencies are done run
+    *                 at the same time, so the two model families are tuned concurrently
+    *
+    ****************************************************************************
+    """
+
+    def __init__(self,run_id=None,data_path=None):
+        config = Config()
+        self.run_id = run_id or config.get_run_id()
+        self.data_path = data_path or config.training_data_path
+        self.trainer = ModelTrainer(self.run_id, self.data_path, 'training')
+        self.state_file = self.trainer.stage_file('train_state.json')
+        self.state = {}
+        self.lock = threading.Lock()
+        self.stages = self.build_stages()
+
+    def build_stages(self):
+        """
+        * method: build_stages
+        * description: method to declare the stages of the training and their dependencies
+        * return: dictionary of stage per name
+        *
+        *
+        * Parameters
+        *   none:
+        """
+        trainer = self.trainer
+        schema = os.path.join(SCHEMA_PATH, 'schema_train.json')
+        stages = [
+            # the ingestion moves the files it loaded, its inputs are the files still waiting to be loaded
+            Stage('ingestion', trainer.ingest, inputs=[self.data_path, schema], outputs=trainer.validated_data,
+                  settings=lambda: dict(asdict(trainer.loadValidate.ingestion_config),
+                                        compact_dtypes=trainer.loadValidate.transformation_config.compact_dtypes)),
+            Stage('validation', trainer.validate, deps=['ingestion'], inputs=[schema],
+                  outputs=[trainer.stage_file('validation.json')]),
+            # the preprocessing reads the validated set itself, so that set is one of its inputs
+            Stage('preprocessing', trainer.preprocess, deps=['validation'], inputs=trainer.validated_data,
+                  outputs=[trainer.stage_file('preprocessed.pkl')],
+                  settings=lambda: dict(asdict(trainer.preprocessor.transformation_config), **asdict(trainer.trainer_config))),
+            Stage('tuning_xgboost', lambda: trainer.tune('XGBoost'), deps=['preprocessing'],
+                  outputs=[trainer.stage_file('XGBoost.pkl')], settings=lambda: asdict(trainer.tuner.tuner_config)),
+            Stage('tuning_randomforest', lambda: trainer.tune('RandomForest'), deps=['preprocessing'],
+                  outputs=[trainer.stage_file('RandomForest.pkl')], settings=lambda: asdict(trainer.tuner.tuner_config)),
+            # the save stage writes the model, the encoder and the imputer under the model directory
+            Stage('save', trainer.save_best_model, deps=['tuning_xgboost', 'tuning_randomforest'],
+                  outputs=[trainer.stage_file('best_model.json'), os.path.join('apps', 'models')])
+        ]
+        return {stage.name: stage for stage in stages}
+
+    def input_fingerprint(self,stage,dep_fingerprints):
+        """
+        * method: input_fingerprint
+        * description: method to compute the fingerprint of the inputs, settings and dependency outputs of a stage
+        * return: sha256 hex digest
+        *
+        *
+        * Parameters
+        *   stage:
+        *   dep_fingerprints: dictionary of output fingerprint per dependency
+        """
+        inputs = {path: path_fingerprint(path) for path in stage.input_paths()}
+        settings = stage.settings() if callable(stage.settings) else stage.settings
+        content = json.dumps([inputs, settings, dep_fingerprints], sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def run_stage(self,stage,dep_fingerprints,force=False):
+        """
+        * method: run_stage
+        * description: method to run a stage unless it is up to date
+        * return: fingerprint of the stage outputs
+        *
+        *
+        * Parameters
+        *   stage:
+        *   dep_fingerprints:
+        *   force: True to run the stage even when it is up to date
+        """
+        recorded = self.state.get(stage.name, {})
+        outputs = {path: path_fingerprint(path) for path in stage.output_paths()}
+        if (not force and outputs and all(outputs.values()) and recorded.get('outputs') == outputs
+                and recorded.get('inputs') == self.input_fingerprint(stage, dep_fingerprints)):
+            logging.info('Stage %s is up to date' % stage.name)
+        else:
+            logging.info('Start of stage %s...' % stage.name)
+            stage.run()
+            # the fingerprint is taken after the run, the ingestion has consumed its input files by then
+            outputs = {path: path_fingerprint(path) for path in stage.output_paths()}
+            with self.lock:
+                self.state[stage.name] = {'inputs': self.input_fingerprint(stage, dep_fingerprints),
+                                          'outputs': outputs, 'run_id': self.run_id}
+                self.trainer.save_stage_output(self.state, 'train_state.json')
+            logging.info('End of stage %s...' % stage.name)
+        return hashlib.sha256(json.dumps(outputs, sort_keys=True).encode()).hexdigest()
+
+    def run(self,force=()):
+        """
+        * method: run
+        * description: method to run the out of date stages, each as soon as its dependencies are done
+        * return: dictionary of output fingerprint per stage
+        *
+        *
+        * Parameters
+        *   force: names of the stages to run even when they are up to date
+        """
+        try:
+            logging.info('Start of training pipeline %s...' % self.run_id)
+            if os.path.isfile(self.state_file):
+                self.state = self.trainer.load_stage_output('train_state.json')
+            done = {}
+            pending = dict(self.stages)
+            running = {}
+            with ThreadPoolExecutor(max_workers=len(self.stages)) as executor:
+                while pending or running:
+                    for name, stage in list(pending.items()):
+                        if all(dep in done for dep in stage.deps):
+                            del pending[name]
+                            running[executor.submit(self.run_stage, stage, {dep: done[dep] for dep in stage.deps},
+                                                    name in force)] = name
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done[running.pop(future)] = future.result()
+            logging.info('End of training pipeline %s...' % self.run_id)
+            return done
+        except Exception as e:
+            logging.info('Unsuccessful End of training pipeline')
+            raise CustomException(e,sys)
+
+
+if __name__=="__main__":
+    TrainPipeline().run(force=sys.argv[1:])
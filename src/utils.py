@@ -3,10 +3,29 @@ import random
 import pickle
 import os
 import shutil
+import hashlib
 from src.logger import logging
 from src.exception import CustomException
 import sys
 
+def get_file_hash(file_path,block_size=1 << 20):
+    """
+    * method: get_file_hash
+    * description: method to compute the content hash of a file, reading it in blocks
+    * return: sha256 hex digest of the file content
+    *
+    *
+    * Parameters
+    *   file_path:
+    *   block_size:
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 class Config:
     """
     *****************************************************************************
@@ -121,6 +140,52 @@ class FileOperation:
             logging.info('Exception raised while Loading Model')
             raise CustomException(e,sys)
 
+    def save_artifact(self,artifact,model_name,artifact_name):
+        """
+        * method: save_artifact
+        * description: method to save a fitted artifact, such as the feature encoder, next to the model file
+        * return: File gets saved
+        *
+        *
+        * Parameters
+        *   artifact:
+        *   model_name:
+        *   artifact_name:
+        """
+        try:
+            logging.info('Start of Save Artifact')
+            path = os.path.join('apps/models/',model_name)
+            os.makedirs(path, exist_ok=True)
+            with open(path + '/' + artifact_name + '.sav', 'wb') as f:
+                pickle.dump(artifact, f)
+            logging.info('Artifact File '+artifact_name+' of '+model_name+' saved')
+            logging.info('End of Save Artifact')
+            return 'success'
+        except Exception as e:
+            logging.info('Exception raised while Save Artifact')
+            raise CustomException(e,sys)
+
+    def load_artifact(self,model_name,artifact_name):
+        """
+        * method: load_artifact
+        * description: method to load a fitted artifact saved next to the model file
+        * return: the artifact
+        *
+        *
+        * Parameters
+        *   model_name:
+        *   artifact_name:
+        """
+        try:
+            logging.info('Start of Load Artifact')
+            with open('apps/models/' + model_name + '/' + artifact_name + '.sav','rb') as f:
+                logging.info('Artifact File ' + artifact_name + ' of ' + model_name + ' loaded')
+                logging.info('End of Load Artifact')
+                return pickle.load(f)
+        except Exception as e:
+            logging.info('Exception raised while Loading Artifact')
+            raise CustomException(e,sys)
+
     def correct_model(self,cluster_number):
         """
         * method: correct_model
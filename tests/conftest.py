@@ -0,0 +1,54 @@
+import os
+import sys
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def pytest_configure(config):
+    # the package writes its logs under the working directory as soon as it is imported
+    os.chdir(tempfile.mkdtemp(prefix='hr_tests_'))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    * method: workdir
+    * description: fixture to run a test in its own working directory holding the schema files, the
+    *              database, the exports and the artifacts of the test are written under it
+    * return: path of the working directory
+    """
+    from src.components.database_operation import connection_manager
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join('artifacts', 'database'))
+    for name in ('schema_train.json', 'schema_predict.json'):
+        shutil.copy(os.path.join(ROOT, 'artifacts', 'database', name), os.path.join('artifacts', 'database', name))
+    yield tmp_path
+    connection_manager.close_all()
+
+
+@pytest.fixture
+def training_file(workdir):
+    """
+    * method: training_file
+    * description: fixture to write synthetic training files with the benchmark generator, with missing
+    *              values in a float, an integer and the categorical column
+    * return: function of the file path, the number of rows and the seed
+    """
+    from src.benchmark import Benchmark
+
+    def write(path, rows=400, seed=0, missing=True):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Benchmark(rows=rows, seed=seed).write_training_file(path, rows)
+        if missing:
+            data = pd.read_csv(path, dtype=str, keep_default_na=False)
+            data.loc[::5, 'satisfaction_level'] = ''
+            data.loc[::7, 'number_project'] = ''
+            data.loc[::11, 'salary'] = ''
+            data.to_csv(path, index=False)
+        return path
+    return write
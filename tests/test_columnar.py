@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.components.data_ingestion import LoadValidate
+from src.components.data_schema import load_schema
+from src.components.data_transformation import Preprocessor
+
+
+def ingest(data_path, export_format, compact=False):
+    ingestion = LoadValidate('test', data_path, 'training')
+    ingestion.ingestion_config.export_format = export_format
+    ingestion.transformation_config.compact_dtypes = compact
+    ingestion.validate_trainset()
+    return ingestion
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_columnar_export_reads_like_csv(training_file, compact):
+    training_file('d/HR_1.csv')
+    ingestion = ingest('d', 'csv', compact)
+    preprocessor = Preprocessor('test', 'd', 'training')
+    preprocessor.transformation_config.compact_dtypes = compact
+    assert preprocessor.input_source()[0] == 'csv'
+    from_csv = preprocessor.get_data()
+    ingestion.dbOperation.export_columnar('training', 'training_raw_data_t', load_schema('schema_train'), compact=compact)
+    assert preprocessor.input_source()[0] == 'columnar'
+    from_columnar = preprocessor.get_data()
+    pd.testing.assert_frame_equal(from_columnar, from_csv)
+    assert from_columnar['number_project'].isna().sum() == from_csv['number_project'].isna().sum() > 0
+    assert list(from_columnar['salary'].cat.categories) == load_schema('schema_train').categories['salary']
+
+
+def test_read_columnar_maps_the_columns_without_copy(training_file, monkeypatch):
+    training_file('d/HR_1.csv')
+    ingest('d', 'columnar')
+    loaded = []
+    load = np.load
+
+    def recording_load(*args, **kwargs):
+        array = load(*args, **kwargs)
+        loaded.append(array)
+        return array
+    monkeypatch.setattr(np, 'load', recording_load)
+    preprocessor = Preprocessor('test', 'd', 'training')
+    data = preprocessor.read_columnar(preprocessor.input_source()[1], 10, 300)
+    assert len(data) == 290
+    for column in data.columns:
+        values = data[column].array
+        if isinstance(values, pd.Categorical):
+            buffer = values.codes
+        elif isinstance(values, pd.arrays.IntegerArray):
+            buffer = values._data
+        elif data[column].dtype == object:
+            continue
+        else:
+            buffer = data[column].to_numpy()
+        assert any(np.shares_memory(buffer, array) for array in loaded), column
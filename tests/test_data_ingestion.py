@@ -0,0 +1,42 @@
+import os
+import sqlite3
+import pandas as pd
+from src.components.data_ingestion import LoadValidate
+from src.components.data_transformation import Preprocessor
+
+
+def ingest(data_path):
+    LoadValidate('test', data_path, 'training').validate_trainset()
+    return Preprocessor('test', data_path, 'training').get_data()
+
+
+def rows_of(*paths):
+    return sorted(map(tuple, pd.concat([pd.read_csv(path, dtype=str) for path in paths]).values.tolist()))
+
+
+def test_reingesting_a_changed_file_replaces_its_rows(training_file):
+    training_file('d/HR_1.csv', rows=200, seed=0, missing=False)
+    training_file('d/HR_2.csv', rows=100, seed=1, missing=False)
+    expected = rows_of('d/HR_1.csv', 'd/HR_2.csv')
+    assert sorted(map(tuple, ingest('d').astype(str).values.tolist())) == expected
+    assert os.listdir('d') == []
+
+    # a new version of HR_1.csv with other rows
+    training_file('d/HR_1.csv', rows=150, seed=5, missing=False)
+    expected = rows_of('d/HR_1.csv', 'd_processed/HR_2.csv')
+    data = ingest('d')
+    assert len(data) == 250
+    assert sorted(map(tuple, data.astype(str).values.tolist())) == expected
+    conn = sqlite3.connect(os.path.join('artifacts', 'database', 'training.db'))
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM training_raw_data_t').fetchone()[0] == 250
+        assert conn.execute("SELECT COUNT(*) FROM ingestion_manifest_t WHERE file_name = 'HR_1.csv'").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_reingesting_an_unchanged_file_skips_it(training_file):
+    training_file('d/HR_1.csv', rows=200, seed=0, missing=False)
+    first = ingest('d')
+    training_file('d/HR_1.csv', rows=200, seed=0, missing=False)
+    pd.testing.assert_frame_equal(ingest('d'), first)
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+from src.components.data_ingestion import LoadValidate
+from src.components.data_transformation import Preprocessor
+
+
+def preprocessor(compact):
+    preprocessor = Preprocessor('test', 'd', 'training')
+    preprocessor.transformation_config.compact_dtypes = compact
+    preprocessor.transformation_config.use_cache = False
+    return preprocessor
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'columnar'])
+@pytest.mark.parametrize('compact', [False, True])
+def test_iter_predictset_equals_preprocess_predictset(training_file, export_format, compact):
+    training_file('d/HR_1.csv', rows=500)
+    ingestion = LoadValidate('test', 'd', 'training')
+    ingestion.ingestion_config.export_format = export_format
+    ingestion.transformation_config.compact_dtypes = compact
+    ingestion.validate_trainset()
+    trainer = preprocessor(compact)
+    trainer.preprocess_trainset()
+    assert trainer.null_present
+
+    predictor = preprocessor(compact)
+    predictor.encoder, predictor.imputer = trainer.encoder, trainer.imputer
+    full = predictor.preprocess_predictset()
+    chunks = list(predictor.iter_predictset(123))
+    assert len(chunks) == 5
+    pd.testing.assert_frame_equal(pd.concat(chunks), full)
+    assert not full.isna().any().any()
@@ -0,0 +1,35 @@
+import os
+import shutil
+import pytest
+import sklearn
+from src.pipeline.train_pipeline import TrainPipeline
+
+# the Random Forest grid of the tuner has max_features='auto', removed in scikit-learn 1.3
+pytestmark = pytest.mark.skipif(tuple(int(part) for part in sklearn.__version__.split('.')[:2]) >= (1, 3),
+                                reason="max_features='auto' needs the pinned scikit-learn")
+
+
+def run_pipeline():
+    pipeline = TrainPipeline(data_path='d')
+    pipeline.trainer.tuner.tuner_config.search_strategy = 'staged'
+    ran = []
+    for stage in pipeline.stages.values():
+        stage.run = (lambda run, name: lambda: (ran.append(name), run())[1])(stage.run, stage.name)
+    pipeline.run()
+    return set(ran)
+
+
+def test_pipeline_rerun_is_a_no_op(training_file):
+    training_file('d/HR_1.csv', rows=600, seed=1)
+    assert run_pipeline() == {'ingestion', 'validation', 'preprocessing', 'tuning_xgboost', 'tuning_randomforest', 'save'}
+    with open(os.path.join('artifacts', 'pipeline', 'best_model.json')) as f:
+        best_model = f.read()
+
+    assert run_pipeline() == set()
+    with open(os.path.join('artifacts', 'pipeline', 'best_model.json')) as f:
+        assert f.read() == best_model
+
+    # only the stage writing a removed output runs again
+    shutil.rmtree(os.path.join('apps', 'models'))
+    assert run_pipeline() == {'save'}
+    assert run_pipeline() == set()
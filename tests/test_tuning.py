@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.model_selection import GridSearchCV
+from xgboost import XGBClassifier
+from src.benchmark import Benchmark
+from src.components.binned_search import BinnedSearchCV
+from src.components.staged_search import StagedSearchCV
+from src.components.tuning_store import TuningStore, CheckpointedSearchCV
+
+PARAM_GRID = {'learning_rate': [0.5, 0.1], 'max_depth': [2, 3], 'n_estimators': [5, 20]}
+
+
+@pytest.fixture(scope='module')
+def training_set():
+    x, y = make_classification(600, n_features=8, random_state=0)
+    return pd.DataFrame(x.astype('float32')), pd.Series(y)
+
+
+def scores(search):
+    return {tuple(sorted(params.items())): score
+            for params, score in zip(search.cv_results_['params'], search.cv_results_['mean_test_score'])}
+
+
+def grid_scores(estimator, train_x, train_y):
+    return scores(GridSearchCV(estimator, PARAM_GRID, cv=5).fit(train_x, train_y))
+
+
+def test_checkpointed_search_equals_grid_search(workdir, training_set):
+    train_x, train_y = training_set
+    estimator = XGBClassifier(n_jobs=1)
+    store = TuningStore('tuning/tuning_scores.db')
+    first = CheckpointedSearchCV(estimator, PARAM_GRID, store, n_jobs=2).fit(train_x, train_y)
+    # the second search takes every fold score from the store
+    resumed = CheckpointedSearchCV(estimator, PARAM_GRID, store).fit(train_x, train_y)
+    assert resumed.n_fits_ == 0
+    expected = grid_scores(estimator, train_x, train_y)
+    assert scores(first) == expected
+    assert scores(resumed) == expected
+
+
+@pytest.mark.parametrize('search_class', [StagedSearchCV, BinnedSearchCV])
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_staged_and_binned_searches_equal_grid_search(workdir, training_set, search_class, n_jobs):
+    train_x, train_y = training_set
+    estimator = XGBClassifier(n_jobs=1, tree_method='hist', max_bin=256)
+    search = search_class(estimator, PARAM_GRID, n_jobs=n_jobs).fit(train_x, train_y)
+    expected = grid_scores(estimator, train_x, train_y)
+    assert scores(search).keys() == expected.keys()
+    assert np.allclose([scores(search)[key] for key in expected], list(expected.values()))
+
+
+def test_lease_of_killed_worker_is_taken_back(workdir):
+    results = Benchmark(rows=600, seed=1).queue_recovery(lease_seconds=2)
+    assert results['killed job attempts'] >= 2
+    assert results['same scores as grid search']